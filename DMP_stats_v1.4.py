@@ -11,12 +11,20 @@ import os
 import re
 import pandas as pd
 import numpy as np
-import json
-import api_v0_new as api
-import api_v1_new as api2
+import api_v0 as api
+import api_v1 as api2
+import archive
+import batching
+import download_manifest
+import file_scan
+import html_clean
+import plan_store
+import plan_sweep
+import records
 from csv import reader
 from loguru import logger
 from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 
 # Show all data in screen
@@ -24,109 +32,47 @@ pd.set_option("display.max.columns", None)
 
 # Create year variable for filenames to get only files for the current year
 # This for when the script is periodically run during the year: on the first of the month
-# The rundate if scheduled on the first of January is adjusted to account for availability
-# of downloaded data.
+# The daily files go up to yesterday, so the period is the year of yesterday: a run on
+# the first of January covers the whole previous year and is dated on its last day.
 today = datetime.now()
-month = today.month
-day = today.day
-if month==1 and day==1:
-    yearnew = today.year
-    runyear = str(yearnew - 1)
-    year = runyear
-    runday = runyear + '-12-31'
-else:
-    year = today.strftime("%Y")
-    runday = str(datetime.today().date())
-    runyear = str(datetime.today().year)
+period_end = (today - timedelta(days=1)).date()
+year = str(period_end.year)
+runyear = year
+runday = str(min(today.date(), period_end.replace(month=12, day=31)))
 
 # Step 1 Read Json files
-# Establish location and files with data. Put the filenames in a table
-# and add the date in the file name as data for a column
+# Establish location and files with data. The daily files are in year=yyyy/month=mm
+# partitions of this folder, only the partitions of the year are opened. The catalog in
+# each partition keeps the plan data needed below for every daily file, so only the
+# files that are new or changed since the last run are read.
 
 path = 'U:\Werk\Data Management\Python\Files\DMP_Online\dmps'
 
-# Get list of all files only in the given directory
-dmplist = lambda x: os.path.isfile(os.path.join(path, x))
-files_list = filter(dmplist, os.listdir(path))
-
-# Create a list of files in directory along with the size
-size_of_file = [
-    (f, os.stat(os.path.join(path, f)).st_size)
-    for f in files_list
-]
-
-# Create a table with the list as input
-dmp_list = pd.DataFrame(size_of_file, columns=['File_name', 'File_size'])
-# Add some extra fields
-dmp_list['File_Date'] = dmp_list.File_name.str[0:10]
-dmp_list['Year'] = dmp_list.File_name.str[0:4]
-
-# Remove files from the list that are not for the current year
-dmp_list = dmp_list[dmp_list.Year == year]
-# Remove files from the list that are empty or close to it
-dmp_list = dmp_list[dmp_list.File_size > 1025] # 10 = bytes
-# Remove files that are not Json files but csv files
-dmp_list = dmp_list[ dmp_list['File_name'].str.contains('.csv')==False ]
-
-# Reset index of the table
-dmp_list.reset_index(drop=True, inplace=True)
-
-filenr = dmp_list.shape[0]
-
-print('Number of Json files to process: ', filenr)
-
 # Step 2 Use list to get data from Json files
 # Generate folders for the data
 Path('DMP_stats\\'+runyear).mkdir(parents=True, exist_ok=True)
 Path('DMP_stats\\'+runyear+'\cert2').mkdir(parents=True, exist_ok=True)
 Path('DMP_stats\\'+runyear+'\gdpr2').mkdir(parents=True, exist_ok=True)
 
-DMP_data = pd.DataFrame()
-i = 0
-while i != filenr:
-    logger.debug(f'Copying and adding data from ' + dmp_list.File_name[i])
-    f = open(f'U:\Werk\Data Management\Python\\Files\DMP_Online\dmps\\{dmp_list.File_name[i]}', 'r')
-    # returns JSON object as a dicionary
-    data = json.load(f)
-    # Iterating through the json list to get specific items
-    # First put them in item lists and then create a table by combining them
-    id_list = []
-    title_list = []
-    file_name = []
-    templates = []
-    funders = []
-    LastUpdate = []
-    for l1 in data:
-        for l2 in l1:
-            id_list.append(str(l2['id']))
-            title_list.append(l2['title'])
-            file_name.append(dmp_list.File_name[i])
-            templates.append(l2['template']['title'])
-            funders.append(l2['funder']['name'])
-            LastUpdate.append(l2['last_updated'])
-    # Closing file
-    f.close()
-    id_data = {'id': id_list}
-    test_list = pd.DataFrame(id_data)
-    test_list['title'] = title_list
-    test_list['template'] = templates
-    test_list['funder'] = funders
-    test_list['last_updated'] = LastUpdate
-    test_list['file_name'] = file_name
-    DMP_data = pd.concat([DMP_data, test_list], ignore_index=True)
-    i = i + 1
+# The plan store (written by day_job) holds the plans of the days it has recorded, so
+# those are queried directly instead of reading the files again; the other days (from
+# before the store, or never imported) come from the daily files through the catalog
+DMP_data = plan_store.all_headers(path, year=year).drop(columns='creation_date')
+print('Number of DMP versions found: ', DMP_data.shape[0])
 # Export result as a CSV file with the date of the Python run
 DMP_data.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\\fulldmplist2.csv', encoding='utf-8')
 
 # Step 3. Create seperate lists for the VU templates to download specific dmps
-DMP_data_certified = DMP_data[DMP_data['template'] == '1 - VU DMP template 2021 (NWO & ZonMW certified) v1.4'].copy()
+cert_template = '1 - VU DMP template 2021 (NWO & ZonMW certified) v1.4'
+gdpr_template = '2 - VU GDPR registration form for research 2021 v1.1'
+DMP_data_certified = DMP_data[DMP_data['template'] == cert_template].copy()
 DMP_data_certified.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\VU_DMP_Cert2_list.csv', encoding='utf-8')
 DMP_data_certified = DMP_data_certified.drop(DMP_data_certified.columns[[1, 2, 3, 4, 5]], axis=1)
 DMP_data_certified.drop_duplicates()
 Cert_dmps_l = DMP_data_certified.values.tolist()
 cert_dmps = [item for sublist in Cert_dmps_l for item in sublist]
 
-DMP_data_gdpr = DMP_data[DMP_data['template'] == '2 - VU GDPR registration form for research 2021 v1.1'].copy()
+DMP_data_gdpr = DMP_data[DMP_data['template'] == gdpr_template].copy()
 DMP_data_gdpr.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\VU_GDPR_forms2_list.csv', encoding='utf-8')
 DMP_data_gdpr = DMP_data_gdpr.drop(DMP_data_gdpr.columns[[1, 2, 3, 4, 5]], axis=1)
 DMP_data_gdpr = DMP_data_gdpr.drop_duplicates()
@@ -134,25 +80,54 @@ gdpr_dmps_l = DMP_data_gdpr.values.tolist()
 gdpr_dmps = [item for sublist in gdpr_dmps_l for item in sublist]
 
 # Step 4 Use each list to download the DMPS as separate files in separate folders for the record
+# Plans that haven't changed since they were downloaded in an earlier run are kept as they are.
+# The manifest stores for each file the plan and the last_updated date of the version in it.
+manifest_file = f'DMP_stats\{runyear}\download_manifest2.json'
+manifest = download_manifest.load_manifest(manifest_file)
+last_updates = DMP_data.groupby('id')['last_updated'].max().to_dict()
+
+downloads = ([(identifier, f'DMP_stats\{runyear}\gdpr2\{identifier}.json') for identifier in gdpr_dmps]
+             + [(identifier, f'DMP_stats\{runyear}\cert2\{identifier}.json') for identifier in cert_dmps])
+# a plan can be in both lists, then both of its files are checked and written
+new_files = {}
+for identifier, file in downloads:
+    if not download_manifest.is_current(manifest, identifier, last_updates[identifier], file):
+        new_files.setdefault(identifier, []).append(file)
 print('Number of GDPR forms: ', len(gdpr_dmps))
-for item in gdpr_dmps:
-    print(item)
-    identifier = item
-    plans = api.retrieve_plans(identifier)
-    pages = list(plans)
-    # save json file of the DMP
-    with open(f'DMP_stats\{runyear}\gdpr2\{identifier}.json', 'w') as f:
-        f.write(json.dumps(pages))
-
 print('Number of VU DMP forms: ', len(cert_dmps))
-for item2 in cert_dmps:
-    print(item2)
-    identifier = item2
-    plans = api.retrieve_plans(identifier)
-    pages = list(plans)
-    # save json file of the DMP
-    with open(f'DMP_stats\{runyear}\cert2\{identifier}.json', 'w') as f:
-        f.write(json.dumps(pages))
+print('Number of new or changed forms to download: ', sum(len(files) for files in new_files.values()))
+
+# the manifest is also saved when a download fails, so the forms done so far are kept
+try:
+    if len(new_files) > plan_sweep.SWEEP_THRESHOLD:
+        # Go through the full list of plans once and keep the forms that are needed,
+        # instead of going through the list for each form separately
+        found = set()
+        for plan in plan_sweep.sweep(api.retrieve_plans(), new_files, {gdpr_template, cert_template}):
+            identifier = str(plan['id'])
+            found.add(identifier)
+            # save json file of the DMP, in the same structure as when it is downloaded by itself
+            for file in new_files[identifier]:
+                archive.write_pages(file, [[plan]])
+                download_manifest.record(manifest, identifier, plan['last_updated'], file)
+        # plans no longer on a VU template (or removed): their forms from earlier runs are outdated
+        for identifier in set(new_files) - found:
+            for file in new_files[identifier]:
+                if download_manifest.remove(manifest, file):
+                    print(f'Removed {file}: plan {identifier} is no longer on a VU template')
+    else:
+        for identifier, files in new_files.items():
+            print(identifier)
+            plans = list(api.retrieve_plans(identifier))
+            # the version that was downloaded, it can be newer than the one in DMP_data
+            downloaded = [plan['last_updated'] for page in plans for plan in page or []]
+            # save json file of the DMP
+            for file in files:
+                archive.write_pages(file, plans)
+                if downloaded:
+                    download_manifest.record(manifest, identifier, downloaded[0], file)
+finally:
+    download_manifest.save_manifest(manifest, manifest_file)
 
 # I have created code to process specific fields in different ways for both forms.
 # This applies to the code for both the GDPR form as well as the VU main template
@@ -164,23 +139,6 @@ for item2 in cert_dmps:
 # Generate path for the AVG Register overview
 Path('DMP_stats\\'+runyear+'\overview2').mkdir(parents=True, exist_ok=True)
 
-# Function to strip html code from text answer fields
-def remove_html(text):
-    tags = False
-    quote = False
-    output = ""
-
-    for ch in text:
-        if ch == '<' and not quote:
-            tag = True
-        elif ch == '>' and not quote:
-            tag = False
-        elif (ch == '"' or ch == "'") and tag:
-            quote = not quote
-        elif not tag:
-            output = output + ch
-    return output
-
 # List of characters combinations to clean or replace in text fields
 tags_sp = ['&ndash', '&nbsp', '&amp', '&amp;']
 tags_nv = [';']
@@ -188,27 +146,33 @@ tags_nv = [';']
 # Step 5a Start getting the data from the GDPR form json files
 pathg = 'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\'+runyear+'\gdpr2'
 
-# Get list of all gdpr form files only in the given directory
-dmplistgdpr = lambda x: os.path.isfile(os.path.join(pathg, x))
-files_list_gdpr = filter(dmplistgdpr, os.listdir(pathg))
+# Get a table of all gdpr form json files (plain or compressed) in the given directory along
+# with the size, in one pass over the directory
+dmp_list_gdpr = file_scan.listing(file_scan.cached_scan(pathg, suffixes='.json'))
+filenrg = dmp_list_gdpr.shape[0]
 
-# Create a list of files in directory along with the size
-size_of_file_g = [
-    (f, os.stat(os.path.join(pathg, f)).st_size)
-    for f in files_list_gdpr
+# The columns of the gdpr and cert overviews, also when there are no files
+overview_columns = [
+    'id', 'title', 'template', 'funder', 'last_updated', 'file_name', 'contact_name',
+    'contact_email', 'plan_version', 'project_title', 'Organisation', 'Other_org',
+    'Project_code', 'Other_DMP_url', 'Existing_data', 'New_data', 'Population_descr',
+    'Personal_data_type', 'Informed_consent_type', 'Other_legal_ground_desc',
+    'Other_legal_ground', 'Personal_data_cat_desc', 'Personal_data_spec_cat',
+    'Informed_Consent_Exemption', 'Data_security_measures', 'Tools_during_res_descr',
+    'Tools_during_research', 'Other_tools_during', 'Data_transfer', 'Data_transfer_desc',
+    'Data_transfer_EEA', 'Transfer_EEA_desc', 'Eth_Com_app_needed', 'Eth_Com_Approved',
+    'Arch_and_or_Publ', 'Which_archives', 'Archive_options', 'Other_archives', 'Archive_period',
+    'Dataset_Publish', 'Researcher_Resp_during', 'Person_resp_after', 'Proced_to_req_dataset',
+    'Faculty_situated',
 ]
 
-# Create a table with the list as input
-dmp_list_gdpr = pd.DataFrame(size_of_file_g, columns=['File_name', 'File_size'])
-filenrg = dmp_list_gdpr.shape[0]
-
-DMP_gdpr_data = pd.DataFrame()
+# Collect the rows of all files and make them into one table after the loop
+DMP_gdpr_rows = records.RecordBuilder(overview_columns)
 i = 0
 while i != filenrg:
     logger.debug(f'Collecting data from GDPR file: ' + dmp_list_gdpr.File_name[i])
-    g = open(f'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\{runyear}\gdpr2\\{dmp_list_gdpr.File_name[i]}', 'r')
-    # returns JSON object as a dictionary
-    datag = json.load(g)
+    # reads the pages one at a time, also from compressed files
+    datag = archive.iter_pages(f'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\{runyear}\gdpr2\\{dmp_list_gdpr.File_name[i]}')
     # Iterating through the json list to get specific items
     # First put them in item lists and then create a table by combining them
     id_list_g = []
@@ -242,17 +206,7 @@ while i != filenrg:
                     answerv = 'Unknown'
                 else:
                     text = Dictionaryq['answer']['text']
-                    # Strip html code from answer
-                    answervt = remove_html(text)
-                    # Combine multiline input into a single line
-                    answerv = "_-_".join(line.strip() for line in answervt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerv:
-                            answerv = answerv.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerv:
-                            answerv = answerv.replace(tag, '.')
+                    answerv = html_clean.clean_answer(text, tags_sp, tags_nv, '.')
             except:
                 answerv = 'Unknown'
                 pass
@@ -267,17 +221,7 @@ while i != filenrg:
                     answerpt = 'Unknown'
                 else:
                     newtext = Dictionarypt['answer']['text']
-                    # Strip html code from answer
-                    answerptt = remove_html(newtext)
-                    # Combine multiline input into a single line
-                    answerpt = "_-_".join(line.strip() for line in answerptt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpt:
-                            answerpt = answerpt.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpt:
-                            answerpt = answerpt.replace(tag, '.')
+                    answerpt = html_clean.clean_answer(newtext, tags_sp, tags_nv, '.')
             except:
                 answerpt = 'Unknown'
                 pass
@@ -313,17 +257,7 @@ while i != filenrg:
                     answeron = 'Unknown'
                 else:
                     text = Dictionaryon['answer']['text']
-                    # Strip html code from answer
-                    answeront = remove_html(text)
-                    # Combine multiline input into a single line
-                    answeron = "_-_".join(line.strip() for line in answeront.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeron:
-                            answeron = answeron.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeront:
-                            answeron = answeron.replace(tag, '')
+                    answeron = html_clean.clean_answer(text, tags_sp, tags_nv, '')
             except:
                 answeron = 'Unknown'
                 pass
@@ -338,17 +272,7 @@ while i != filenrg:
                     answeroo = 'Unknown'
                 else:
                     textyoo = Dictionaryoo['answer']['text']
-                    # Strip html code from answer
-                    answeroot = remove_html(textyoo)
-                    # Combine multiline input into a single line
-                    answeroo = "_-_".join(line.strip() for line in answeroot.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeroo:
-                            answeroo = answeroo.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeroo:
-                            answeroo = answeroo.replace(tag, '')
+                    answeroo = html_clean.clean_answer(textyoo, tags_sp, tags_nv, '')
             except:
                 answeroo = 'Unknown'
                 pass
@@ -363,17 +287,7 @@ while i != filenrg:
                     answerpc = 'Unknown'
                 else:
                     textpc = Dictionarypc['answer']['text']
-                    # Strip html code from answer
-                    answerpct = remove_html(textpc)
-                    # Combine multiline input into a single line
-                    answerpc = "_-_".join(line.strip() for line in answerpct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpc:
-                            answerpc = answerpc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpc:
-                            answerpc = answerpc.replace(tag, '')
+                    answerpc = html_clean.clean_answer(textpc, tags_sp, tags_nv, '')
             except:
                 answerpc = 'Unknown'
                 pass
@@ -395,17 +309,7 @@ while i != filenrg:
                         if textdmp == '':
                             answerodmp = 'Unknown'
                         else:
-                            # Strip html code from answer
-                            answerdmpt = remove_html(textdmp)
-                            # Combine multiline input into a single line
-                            answerodmp = "_-_".join(line.strip() for line in answerdmpt.splitlines())
-                            # Remove the special characters
-                            for tag in tags_sp:
-                                if tag in answerodmp:
-                                    answerodmp = answerodmp.replace(tag, ' ')
-                            for tag in tags_nv:
-                                if tag in answerodmp:
-                                    answerodmp = answerodmp.replace(tag, '')
+                            answerodmp = html_clean.clean_answer(textdmp, tags_sp, tags_nv, '')
                 except:
                     answerodmp = 'Unknown'
                     pass
@@ -420,17 +324,7 @@ while i != filenrg:
                     answerddr = 'Unknown'
                 else:
                     textddr = Dictionaryddr['answer']['text']
-                    # Strip html code from answer
-                    answerddrt = remove_html(textddr)
-                    # Combine multiline input into a single line
-                    answerddr = "_-_".join(line.strip() for line in answerddrt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerddr:
-                            answerddr = answerddr.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerddr:
-                            answerddr = answerddr.replace(tag, '')
+                    answerddr = html_clean.clean_answer(textddr, tags_sp, tags_nv, '')
             except:
                 answerddr = 'Unknown'
                 pass
@@ -445,17 +339,7 @@ while i != filenrg:
                     answerndd = 'Unknown'
                 else:
                     textndd = Dictionaryndd['answer']['text']
-                    # Strip html code from answer
-                    answernddt = remove_html(textndd)
-                    # Combine multiline input into a single line
-                    answerndd = "_-_".join(line.strip() for line in answernddt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerndd:
-                            answerndd = answerndd.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerndd:
-                            answerndd = answerndd.replace(tag, '')
+                    answerndd = html_clean.clean_answer(textndd, tags_sp, tags_nv, '')
             except:
                 answerndd = 'Unknown'
                 pass
@@ -470,17 +354,7 @@ while i != filenrg:
                     answerpop = 'Unknown'
                 else:
                     textpop = Dictionarypop['answer']['text']
-                    # Strip html code from answer
-                    answerpopt = remove_html(textpop)
-                    # Combine multiline input into a single line
-                    answerpop = "_-_".join(line.strip() for line in answerpopt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpop:
-                            answerpop = answerpop.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpop:
-                            answerpop = answerpop.replace(tag, '')
+                    answerpop = html_clean.clean_answer(textpop, tags_sp, tags_nv, '')
             except:
                 answerpop = 'Unknown'
                 pass
@@ -537,16 +411,7 @@ while i != filenrg:
                     answerlgd = 'Unknown'
                 else:
                     textlg = Dictionarylg['answer']['text']
-                    answerlgdt = remove_html(textlg)
-                    # Combine multiline input into a single line
-                    answerlgd = "_-_".join(line.strip() for line in answerlgdt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerlgd:
-                            answerlgd = answerlgd.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerlgd:
-                            answerlgd = answerlgd.replace(tag, '')
+                    answerlgd = html_clean.clean_answer(textlg, tags_sp, tags_nv, '')
                     if answerlgd == '':
                         answerlgd = 'Unknown'
                     else:
@@ -583,16 +448,7 @@ while i != filenrg:
                     if textpdc == "":
                         answerpdcd = 'Unknown'
                     else:
-                        answerpdcdt = remove_html(textpdc)
-                        # Combine multiline input into a single line
-                        answerpdcd = "_-_".join(line.strip() for line in answerpdcdt.splitlines())
-                        # Remove the special characters
-                        for tag in tags_sp:
-                            if tag in answerpdcd:
-                                answerpdcd = answerpdcd.replace(tag, ' ')
-                        for tag in tags_nv:
-                            if tag in answerpdcd:
-                                answerpdcd = answerpdcd.replace(tag, '')
+                        answerpdcd = html_clean.clean_answer(textpdc, tags_sp, tags_nv, '')
 
                     textdc = len(Dictionarypdc['answer']['options'])
                     dcnr = 0
@@ -623,17 +479,7 @@ while i != filenrg:
                     if textce == '':
                         answerce = 'Unknown'
                     else:
-                        # Strip html code from answer
-                        answercet = remove_html(textce)
-                        # Combine multiline input into a single line
-                        answerce = "_-_".join(line.strip() for line in answercet.splitlines())
-                        # Remove the special characters
-                        for tag in tags_sp:
-                            if tag in answerce:
-                                answerce = answerce.replace(tag, ' ')
-                        for tag in tags_nv:
-                            if tag in answerce:
-                                answerce = answerce.replace(tag, '')
+                        answerce = html_clean.clean_answer(textce, tags_sp, tags_nv, '')
             except:
                 answerce = 'Unknown'
                 pass
@@ -648,17 +494,7 @@ while i != filenrg:
                     answersecm = 'Unknown'
                 else:
                     textsecm = Dictionarysecm['answer']['text']
-                    # Strip html code from answer
-                    answersecmt = remove_html(textsecm)
-                    # Combine multiline input into a single line
-                    answersecm = "_-_".join(line.strip() for line in answersecmt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answersecm:
-                            answersecm = answersecm.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answersecm:
-                            answersecm = answersecm.replace(tag, '')
+                    answersecm = html_clean.clean_answer(textsecm, tags_sp, tags_nv, '')
             except:
                 answersecm = 'Unknown'
                 pass
@@ -675,16 +511,7 @@ while i != filenrg:
                     answertudd = 'Unknown'
                 else:
                     texttud = Dictionarytud['answer']['text']
-                    answertuddt = remove_html(texttud)
-                    # Combine multiline input into a single line
-                    answertudd = "_-_".join(line.strip() for line in answertuddt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answertudd:
-                            answertudd = answertudd.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answertudd:
-                            answertudd = answertudd.replace(tag, '')
+                    answertudd = html_clean.clean_answer(texttud, tags_sp, tags_nv, '')
                     if answertudd == '':
                         answertudd = 'Unknown'
                     else:
@@ -713,16 +540,7 @@ while i != filenrg:
                     answerotud = 'Unknown'
                 else:
                     textotud = Dictionaryotud['answer']['text']
-                    answerotudt = remove_html(textotud)
-                    # Combine multiline input into a single line
-                    answerotud = "_-_".join(line.strip() for line in answerotudt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerotud:
-                            answerotud = answerotud.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerotud:
-                            answerotud = answerotud.replace(tag, '')
+                    answerotud = html_clean.clean_answer(textotud, tags_sp, tags_nv, '')
                     if answerotud == '':
                         answerotud = 'Unknown'
             except:
@@ -741,16 +559,7 @@ while i != filenrg:
                     answertra = 'Unknown'
                 else:
                     texttr = Dictionarytr['answer']['text']
-                    answertrat = remove_html(texttr)
-                    # Combine multiline input into a single line
-                    answertra = "_-_".join(line.strip() for line in answertrat.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answertra:
-                            answertra = answertra.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answertra:
-                            answertra = answertra.replace(tag, '')
+                    answertra = html_clean.clean_answer(texttr, tags_sp, tags_nv, '')
                     if answertra == '':
                         answertra = 'Unknown'
                     else:
@@ -784,16 +593,7 @@ while i != filenrg:
                     answereead = 'Unknown'
                 else:
                     texteead = Dictionaryeea['answer']['text']
-                    answereeadt = remove_html(texteead)
-                    # Combine multiline input into a single line
-                    answereead = "_-_".join(line.strip() for line in answereeadt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answereead:
-                            answereead = answereead.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answereead:
-                            answereead = answereead.replace(tag, '')
+                    answereead = html_clean.clean_answer(texteead, tags_sp, tags_nv, '')
                     if answereead == '':
                         answereead = 'Unknown'
                     else:
@@ -824,16 +624,7 @@ while i != filenrg:
                     answerecod = 'Unknown'
                 else:
                     texteco = Dictionaryeco['answer']['text']
-                    answerecot = remove_html(texteco)
-                    # Combine multiline input into a single line
-                    answereco = "_-_".join(line.strip() for line in answerecot.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answereco:
-                            answereco = answereco.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answereco:
-                            answereco = answereco.replace(tag, '')
+                    answereco = html_clean.clean_answer(texteco, tags_sp, tags_nv, '')
                     if answereco == '':
                         answereco = 'Unknown'
                     else:
@@ -865,17 +656,7 @@ while i != filenrg:
                     answeraop = 'Unknown'
                 else:
                     textaop = Dictionaryaop['answer']['text']
-                    # Strip html code from answer
-                    answeraopt = remove_html(textaop)
-                    # Combine multiline input into a single line
-                    answeraop = "_-_".join(line.strip() for line in answeraopt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeraop:
-                            answeraop = answeraop.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeraop:
-                            answeraop = answeraop.replace(tag, '')
+                    answeraop = html_clean.clean_answer(textaop, tags_sp, tags_nv, '')
             except:
                 answeraop = 'Unknown'
                 pass
@@ -892,16 +673,7 @@ while i != filenrg:
                     answerarcho = 'Unknown'
                 else:
                     textarch = Dictionaryarch['answer']['text']
-                    answerarcht = remove_html(textarch)
-                    # Combine multiline input into a single line
-                    answerarch = "_-_".join(line.strip() for line in answerarcht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerarch:
-                            answerarch = answerarch.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerarch:
-                            answerarch = answerarch.replace(tag, '')
+                    answerarch = html_clean.clean_answer(textarch, tags_sp, tags_nv, '')
                     if answerarch == '':
                         answerarch = 'Unknown'
                     else:
@@ -933,17 +705,7 @@ while i != filenrg:
                     answerwoa = 'Unknown'
                 else:
                     textwoa = Dictionarywoa['answer']['text']
-                    # Strip html code from answer
-                    answerwoat = remove_html(textwoa)
-                    # Combine multiline input into a single line
-                    answerwoa = "_-_".join(line.strip() for line in answerwoat.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerwoa:
-                            answerwoa = answerwoa.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerwoa:
-                            answerwoa = answerwoa.replace(tag, '')
+                    answerwoa = html_clean.clean_answer(textwoa, tags_sp, tags_nv, '')
             except:
                 answerwoa = 'Unknown'
                 pass
@@ -958,17 +720,7 @@ while i != filenrg:
                     answerterm = 'Unknown'
                 else:
                     textterm = Dictionaryterm['answer']['text']
-                    # Strip html code from answer
-                    answertermt = remove_html(textterm)
-                    # Combine multiline input into a single line
-                    answerterm = "_-_".join(line.strip() for line in answertermt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerterm:
-                            answerterm = answerterm.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerterm:
-                            answerterm = answerterm.replace(tag, '')
+                    answerterm = html_clean.clean_answer(textterm, tags_sp, tags_nv, '')
             except:
                 answerterm = 'Unknown'
                 pass
@@ -983,17 +735,7 @@ while i != filenrg:
                     answerpubl = 'Unknown'
                 else:
                     textpubl = Dictionarypubl['answer']['text']
-                    # Strip html code from answer
-                    answerpublt = remove_html(textpubl)
-                    # Combine multiline input into a single line
-                    answerpubl = "_-_".join(line.strip() for line in answerpublt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpubl:
-                            answerpubl = answerpubl.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpubl:
-                            answerpubl = answerpubl.replace(tag, '')
+                    answerpubl = html_clean.clean_answer(textpubl, tags_sp, tags_nv, '')
             except:
                 answerpubl = 'Unknown'
                 pass
@@ -1008,17 +750,7 @@ while i != filenrg:
                     answerrrd = 'Unknown'
                 else:
                     textrrd = Dictionaryrrd['answer']['text']
-                    # Strip html code from answer
-                    answerrrdt = remove_html(textrrd)
-                    # Combine multiline input into a single line
-                    answerrrd = "_-_".join(line.strip() for line in answerrrdt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerrrd:
-                            answerrrd = answerrrd.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerrrd:
-                            answerrrd = answerrrd.replace(tag, '')
+                    answerrrd = html_clean.clean_answer(textrrd, tags_sp, tags_nv, '')
             except:
                 answerrrd = 'Unknown'
                 pass
@@ -1033,17 +765,7 @@ while i != filenrg:
                     answerar = 'Unknown'
                 else:
                     textrar = Dictionaryrar['answer']['text']
-                    # Strip html code from answer
-                    answerart = remove_html(textrar)
-                    # Combine multiline input into a single line
-                    answerar = "_-_".join(line.strip() for line in answerart.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerar:
-                            answerar = answerar.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerar:
-                            answerar = answerar.replace(tag, '')
+                    answerar = html_clean.clean_answer(textrar, tags_sp, tags_nv, '')
             except:
                 answerar = 'Unknown'
                 pass
@@ -1058,71 +780,60 @@ while i != filenrg:
                     answeram = 'Unknown'
                 else:
                     textram = Dictionaryram['answer']['text']
-                    # Strip html code from answer
-                    answeramt = remove_html(textram)
-                    # Combine multiline input into a single line
-                    answeram = "_-_".join(line.strip() for line in answeramt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeram:
-                            answeram = answeram.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeram:
-                            answeram = answeram.replace(tag, '')
+                    answeram = html_clean.clean_answer(textram, tags_sp, tags_nv, '')
             except:
                 answeram = 'Unknown'
                 pass
             Req_dataset_proc.append(answeram)
 
-    # Closing file
-    g.close()
-    id_data_g = {'id': id_list_g}
-    test_listg = pd.DataFrame(id_data_g)
-    test_listg['title'] = title_list_g
-    test_listg['template'] = templates_g
-    test_listg['funder'] = funders_g
-    test_listg['last_updated'] = LastUpdate_g
-    test_listg['file_name'] = file_name_g
-    test_listg['contact_name'] = data_contact_ng
-    test_listg['contact_email'] = data_contact_eg
-    test_listg['plan_version'] = Plan_version_g
-    test_listg['project_title'] = Project_title
-    test_listg['Organisation'] = Org_name
-    test_listg['Other_org'] = Oth_Org
-    test_listg['Project_code'] = Project_code
-    test_listg['Other_DMP_url'] = Other_DMP_url
-    test_listg['Existing_data'] = data_reuse
-    test_listg['New_data'] = data_new
-    test_listg['Population_descr'] = popul
-    test_listg['Personal_data_type'] = pers_data_type
-    test_listg['Informed_consent_type'] = Inf_consent
-    test_listg['Other_legal_ground_desc'] = legal_ground_desc
-    test_listg['Other_legal_ground'] = legal_ground
-    test_listg['Personal_data_cat_desc'] = Pers_data_cat_desc
-    test_listg['Personal_data_spec_cat'] = Pers_data_cat
-    test_listg['Informed_Consent_Exemption'] = Consent_exemption
-    test_listg['Data_security_measures'] = sec_measures
-    test_listg['Tools_during_res_descr'] = tools_used_during_desc
-    test_listg['Tools_during_research'] = tools_used_during
-    test_listg['Other_tools_during'] = tools_other_during
-    test_listg['Data_transfer'] = Data_transfer
-    test_listg['Data_transfer_desc'] = Data_transfer_a
-    test_listg['Data_transfer_EEA'] = Data_transfer_eea
-    test_listg['Transfer_EEA_desc'] = Data_transfer_eea_d
-    test_listg['Eth_Com_app_needed'] = Ethics_com_approval
-    test_listg['Eth_Com_Approved'] = Ethics_com_data
-    test_listg['Arch_and_or_Publ'] = Arch_and_Publ
-    test_listg['Which_archives'] = Archives
-    test_listg['Archive_options'] = Archives_options
-    test_listg['Other_archives'] = Other_Archives
-    test_listg['Archive_period'] = Archive_period
-    test_listg['Dataset_Publish'] = Dataset_Publ
-    test_listg['Researcher_Resp_during'] = Res_Resp_during
-    test_listg['Person_resp_after'] = Person_resp_after
-    test_listg['Proced_to_req_dataset'] = Req_dataset_proc
-    test_listg['Faculty_situated'] = Fac_situated
-    DMP_gdpr_data = pd.concat([DMP_gdpr_data, test_listg], ignore_index=True)
+    DMP_gdpr_rows.add({
+        'id': id_list_g,
+        'title': title_list_g,
+        'template': templates_g,
+        'funder': funders_g,
+        'last_updated': LastUpdate_g,
+        'file_name': file_name_g,
+        'contact_name': data_contact_ng,
+        'contact_email': data_contact_eg,
+        'plan_version': Plan_version_g,
+        'project_title': Project_title,
+        'Organisation': Org_name,
+        'Other_org': Oth_Org,
+        'Project_code': Project_code,
+        'Other_DMP_url': Other_DMP_url,
+        'Existing_data': data_reuse,
+        'New_data': data_new,
+        'Population_descr': popul,
+        'Personal_data_type': pers_data_type,
+        'Informed_consent_type': Inf_consent,
+        'Other_legal_ground_desc': legal_ground_desc,
+        'Other_legal_ground': legal_ground,
+        'Personal_data_cat_desc': Pers_data_cat_desc,
+        'Personal_data_spec_cat': Pers_data_cat,
+        'Informed_Consent_Exemption': Consent_exemption,
+        'Data_security_measures': sec_measures,
+        'Tools_during_res_descr': tools_used_during_desc,
+        'Tools_during_research': tools_used_during,
+        'Other_tools_during': tools_other_during,
+        'Data_transfer': Data_transfer,
+        'Data_transfer_desc': Data_transfer_a,
+        'Data_transfer_EEA': Data_transfer_eea,
+        'Transfer_EEA_desc': Data_transfer_eea_d,
+        'Eth_Com_app_needed': Ethics_com_approval,
+        'Eth_Com_Approved': Ethics_com_data,
+        'Arch_and_or_Publ': Arch_and_Publ,
+        'Which_archives': Archives,
+        'Archive_options': Archives_options,
+        'Other_archives': Other_Archives,
+        'Archive_period': Archive_period,
+        'Dataset_Publish': Dataset_Publ,
+        'Researcher_Resp_during': Res_Resp_during,
+        'Person_resp_after': Person_resp_after,
+        'Proced_to_req_dataset': Req_dataset_proc,
+        'Faculty_situated': Fac_situated,
+    })
     i = i + 1
+DMP_gdpr_data = DMP_gdpr_rows.build()
 
 # Drop DMPs that no longer exist and have null data in the overview
 DMP_gdpr_data = DMP_gdpr_data.dropna(subset=['id'])
@@ -1133,27 +844,18 @@ DMP_gdpr_data.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stat
 # The DMPs for the VU template are in this folder
 pathm = 'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\'+runyear+'\cert2'
 
-# Get list of all VU Cert form files only in the given directory
-dmplistcert = lambda x: os.path.isfile(os.path.join(pathm, x))
-files_list_cert = filter(dmplistcert, os.listdir(pathm))
-
-# Create a list of files in directory along with the size
-size_of_file_c = [
-    (f, os.stat(os.path.join(pathm, f)).st_size)
-    for f in files_list_cert
-]
-
-# Create a table with the list as input
-dmp_list_cert = pd.DataFrame(size_of_file_c, columns=['File_name', 'File_size'])
+# Get a table of all VU Cert form json files (plain or compressed) in the given directory along
+# with the size, in one pass over the directory
+dmp_list_cert = file_scan.listing(file_scan.cached_scan(pathm, suffixes='.json'))
 filenrc = dmp_list_cert.shape[0]
 
 # Go through the files to find out which DMPs concern personal data
-DMP_cert_data_temp = pd.DataFrame()
+# Collect the rows of all files and make them into one table after the loop
+DMP_cert_rows_temp = records.RecordBuilder(['id', 'File_name', 'PersonalDataCheck'])
 i = 0
 while i != filenrc:
-    c = open(f'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\{runyear}\cert2\\{dmp_list_cert.File_name[i]}', 'r')
-    # returns JSON object as a dictionary
-    datac = json.load(c)
+    # reads the pages one at a time, also from compressed files
+    datac = archive.iter_pages(f'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\{runyear}\cert2\\{dmp_list_cert.File_name[i]}')
     # Iterating through the json list to get the item on sensitive research: yes/no
     id_list_c = []
     file_name = []
@@ -1177,32 +879,33 @@ while i != filenrc:
                 pass
             Personal_data_check.append(answerpdch)
 
-    # Close file
-    c.close()
-    id_data_c = {'id': id_list_c}
-    test_listc = pd.DataFrame(id_data_c)
-    test_listc['File_name'] = file_name
-    test_listc['PersonalDataCheck'] = Personal_data_check
-    DMP_cert_data_temp = pd.concat([DMP_cert_data_temp, test_listc], ignore_index=True)
-    # Drop DMPs that do not involve personal data
-    DMP_cert_data_temp = DMP_cert_data_temp[DMP_cert_data_temp['PersonalDataCheck'].str.contains('Yes') == True]
-    # Drop Dmps files that are empty
-    DMP_cert_data_temp = DMP_cert_data_temp[DMP_cert_data_temp['id'].le('id') > 0]
+    DMP_cert_rows_temp.add({
+        'id': id_list_c,
+        'File_name': file_name,
+        'PersonalDataCheck': Personal_data_check,
+    })
     i = i + 1
+DMP_cert_data_temp = DMP_cert_rows_temp.build()
+# Drop DMPs that do not involve personal data
+DMP_cert_data_temp = DMP_cert_data_temp[DMP_cert_data_temp['PersonalDataCheck'].str.contains('Yes') == True]
+# Drop Dmps files that are empty
+DMP_cert_data_temp = DMP_cert_data_temp[DMP_cert_data_temp['id'].le('id') > 0]
+# Number the remaining rows 0, 1, ... again for the loop below
+DMP_cert_data_temp = DMP_cert_data_temp.reset_index(drop=True)
 
 # DMP_cert_data_temp.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\cert\\fullcertlist_sens.csv', encoding='utf-8')
 
 # The table DMP_cert_data_temp now lists all VU cert DMPs involving personal data
 filenrcert = DMP_cert_data_temp.shape[0]
 
-DMP_cert_data = pd.DataFrame()
+# Collect the rows of all files and make them into one table after the loop
+DMP_cert_rows = records.RecordBuilder(overview_columns)
 
 v = 0
 while v != filenrcert:
     logger.debug(f'Collecting data from Cert file: ' + DMP_cert_data_temp.File_name[v])
-    h = open(f'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\{runyear}\cert2\\{DMP_cert_data_temp.File_name[v]}', 'r')
-    # returns JSON object as a dictionary
-    datah = json.load(h)
+    # reads the pages one at a time, also from compressed files
+    datah = archive.iter_pages(f'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\{runyear}\cert2\\{DMP_cert_data_temp.File_name[v]}')
     # Iterating through the json list to get specific items
     # First put them in item lists and then create a table by combining them
     id_list_h = []
@@ -1244,17 +947,7 @@ while v != filenrcert:
                     answerpv = 'Unknown'
                 else:
                     textpv = Dictionarypv['answer']['text']
-                    # Strip html code from answer
-                    answerpvt = remove_html(textpv)
-                    # Combine multiline input into a single line
-                    answerpv = "_-_".join(line.strip() for line in answerpvt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpv:
-                            answerpv = answerpv.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpv:
-                            answerpv = answerpv.replace(tag, '.')
+                    answerpv = html_clean.clean_answer(textpv, tags_sp, tags_nv, '.')
             except:
                 answerpv = 'Unknown'
                 pass
@@ -1269,17 +962,7 @@ while v != filenrcert:
                     answerptc = 'Unknown'
                 else:
                     newtext = Dictionaryptc['answer']['text']
-                    # Strip html code from answer
-                    answerptct = remove_html(newtext)
-                    # Combine multiline input into a single line
-                    answerptc = "_-_".join(line.strip() for line in answerptct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerptc:
-                            answerptc = answerptc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerptc:
-                            answerptc = answerptc.replace(tag, '.')
+                    answerptc = html_clean.clean_answer(newtext, tags_sp, tags_nv, '.')
             except:
                 answerptc = 'Unknown'
                 pass
@@ -1315,17 +998,7 @@ while v != filenrcert:
                     answeronc = 'Unknown'
                 else:
                     textonc = Dictionaryonc['answer']['text']
-                    # Strip html code from answer
-                    answeronct = remove_html(textonc)
-                    # Combine multiline input into a single line
-                    answeronc = "_-_".join(line.strip() for line in answeronct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeronc:
-                            answeronc = answeronc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeronc:
-                            answeronc = answeronc.replace(tag, '')
+                    answeronc = html_clean.clean_answer(textonc, tags_sp, tags_nv, '')
             except:
                 answeronc = 'Unknown'
                 pass
@@ -1340,17 +1013,7 @@ while v != filenrcert:
                     answerooc = 'Unknown'
                 else:
                     textooc = Dictionaryooc['answer']['text']
-                    # Strip html code from answer
-                    answerooct = remove_html(textooc)
-                    # Combine multiline input into a single line
-                    answerooc = "_-_".join(line.strip() for line in answerooct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerooc:
-                            answerooc = answerooc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerooc:
-                            answerooc = answerooc.replace(tag, '')
+                    answerooc = html_clean.clean_answer(textooc, tags_sp, tags_nv, '')
             except:
                 answerooc = 'Unknown'
                 pass
@@ -1365,17 +1028,7 @@ while v != filenrcert:
                     answerpcc = 'Unknown'
                 else:
                     textpcc = Dictionarypcc['answer']['text']
-                    # Strip html code from answer
-                    answerpcct = remove_html(textpcc)
-                    # Combine multiline input into a single line
-                    answerpcc = "_-_".join(line.strip() for line in answerpcct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpcc:
-                            answerpcc = answerpcc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpcc:
-                            answerpcc = answerpcc.replace(tag, '')
+                    answerpcc = html_clean.clean_answer(textpcc, tags_sp, tags_nv, '')
                     if answerpcc == '':
                         answerpcc = 'Unknown'
                     else:
@@ -1394,17 +1047,7 @@ while v != filenrcert:
                     answerddrc = 'Unknown'
                 else:
                     textddrc = Dictionaryddrc['answer']['text']
-                    # Strip html code from answer
-                    answerddrct = remove_html(textddrc)
-                    # Combine multiline input into a single line
-                    answerddrc = "_-_".join(line.strip() for line in answerddrct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerddrc:
-                            answerddrc = answerddrc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerddrc:
-                            answerddrc = answerddrc.replace(tag, '')
+                    answerddrc = html_clean.clean_answer(textddrc, tags_sp, tags_nv, '')
                     if answerddrc == '':
                         answerddrc = 'Unknown'
                     else:
@@ -1423,17 +1066,7 @@ while v != filenrcert:
                     answernddc = 'Unknown'
                 else:
                     textddc = Dictionarynddc['answer']['text']
-                    # Strip html code from answer
-                    answernddct = remove_html(textddc)
-                    # Combine multiline input into a single line
-                    answernddc = "_-_".join(line.strip() for line in answernddct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answernddc:
-                            answernddc = answernddc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answernddc:
-                            answernddc = answernddc.replace(tag, '')
+                    answernddc = html_clean.clean_answer(textddc, tags_sp, tags_nv, '')
             except:
                 answernddc = 'Unknown'
                 pass
@@ -1448,17 +1081,7 @@ while v != filenrcert:
                     answerpopc = 'Unknown'
                 else:
                     textpop = Dictionarypopc['answer']['text']
-                    # Strip html code from answer
-                    answerpopct = remove_html(textpop)
-                    # Combine multiline input into a single line
-                    answerpopc = "_-_".join(line.strip() for line in answerpopct.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerpopc:
-                            answerpopc = answerpopc.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerpopc:
-                            answerpopc = answerpopc.replace(tag, '')
+                    answerpopc = html_clean.clean_answer(textpop, tags_sp, tags_nv, '')
             except:
                 answerpopc = 'Unknown'
                 pass
@@ -1515,16 +1138,7 @@ while v != filenrcert:
                     answerlghd = 'Unknown'
                 else:
                     textlgh = Dictionarylgh['answer']['text']
-                    answerlghdt = remove_html(textlgh)
-                    # Combine multiline input into a single line
-                    answerlghd = "_-_".join(line.strip() for line in answerlghdt.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerlghd:
-                            answerlghd = answerlghd.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerlghd:
-                            answerlghd = answerlghd.replace(tag, '')
+                    answerlghd = html_clean.clean_answer(textlgh, tags_sp, tags_nv, '')
                     if answerlghd == '':
                         answerlghd = 'Unknown'
                     else:
@@ -1561,16 +1175,7 @@ while v != filenrcert:
                     if textpdch == "":
                         answerpdcdh = 'Unknown'
                     else:
-                        answerpdcdht = remove_html(textpdch)
-                        # Combine multiline input into a single line
-                        answerpdcdh = "_-_".join(line.strip() for line in answerpdcdht.splitlines())
-                        # Remove the special characters
-                        for tag in tags_sp:
-                            if tag in answerpdcdh:
-                                answerpdcdh = answerpdcdh.replace(tag, ' ')
-                        for tag in tags_nv:
-                            if tag in answerpdcdh:
-                                answerpdcdh = answerpdcdh.replace(tag, '')
+                        answerpdcdh = html_clean.clean_answer(textpdch, tags_sp, tags_nv, '')
 
                     textdch = len(Dictionarypdch['answer']['options'])
                     dchnr = 0
@@ -1601,17 +1206,7 @@ while v != filenrcert:
                     if textceh == '':
                         answerceh = 'Unknown'
                     else:
-                        # Strip html code from answer
-                        answerceht = remove_html(textceh)
-                        # Combine multiline input into a single line
-                        answerceh = "_-_".join(line.strip() for line in answerceht.splitlines())
-                        # Remove the special characters
-                        for tag in tags_sp:
-                            if tag in answerceh:
-                                answerceh = answerceh.replace(tag, ' ')
-                        for tag in tags_nv:
-                            if tag in answerceh:
-                                answerceh = answerceh.replace(tag, '')
+                        answerceh = html_clean.clean_answer(textceh, tags_sp, tags_nv, '')
             except:
                 answerceh = 'Unknown'
                 pass
@@ -1626,17 +1221,7 @@ while v != filenrcert:
                     answersecmh = 'Unknown'
                 else:
                     textsecm = Dictionarysecmh['answer']['text']
-                    # Strip html code from answer
-                    answersecmht = remove_html(textsecm)
-                    # Combine multiline input into a single line
-                    answersecmh = "_-_".join(line.strip() for line in answersecmht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answersecmh:
-                            answersecmh = answersecmh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answersecmh:
-                            answersecmh = answersecmh.replace(tag, '')
+                    answersecmh = html_clean.clean_answer(textsecm, tags_sp, tags_nv, '')
             except:
                 answersecmh = 'Unknown'
                 pass
@@ -1653,16 +1238,7 @@ while v != filenrcert:
                     answertuddh = 'Unknown'
                 else:
                     texttudh = Dictionarytudh['answer']['text']
-                    answertuddth = remove_html(texttudh)
-                    # Combine multiline input into a single line
-                    answertuddh = "_-_".join(line.strip() for line in answertuddth.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answertuddh:
-                            answertuddh = answertuddh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answertuddh:
-                            answertuddh = answertuddh.replace(tag, '')
+                    answertuddh = html_clean.clean_answer(texttudh, tags_sp, tags_nv, '')
                     if answertuddh == '':
                         answertuddh = 'Unknown'
                     else:
@@ -1691,16 +1267,7 @@ while v != filenrcert:
                     answerotudh = 'Unknown'
                 else:
                     textotudh = Dictionaryotudh['answer']['text']
-                    answerotudht = remove_html(textotudh)
-                    # Combine multiline input into a single line
-                    answerotudh = "_-_".join(line.strip() for line in answerotudht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerotudh:
-                            answerotudh = answerotudh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerotudh:
-                            answerotudh = answerotudh.replace(tag, '')
+                    answerotudh = html_clean.clean_answer(textotudh, tags_sp, tags_nv, '')
                     if answerotudh == '':
                         answerotudh = 'Unknown'
             except:
@@ -1719,16 +1286,7 @@ while v != filenrcert:
                     answertrah = 'Unknown'
                 else:
                     texth = Dictionarytrh['answer']['text']
-                    answertraht = remove_html(texth)
-                    # Combine multiline input into a single line
-                    answertrah = "_-_".join(line.strip() for line in answertraht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answertrah:
-                            answertrah = answertrah.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answertrah:
-                            answertrah = answertrah.replace(tag, '')
+                    answertrah = html_clean.clean_answer(texth, tags_sp, tags_nv, '')
                     if answertrah == '':
                         answertrah = 'Unknown'
                     else:
@@ -1764,16 +1322,7 @@ while v != filenrcert:
                         answereeadh = 'Unknown'
                     else:
                         texteeadh = Dictionaryeeah['answer']['text']
-                        answereeadht = remove_html(texteeadh)
-                        # Combine multiline input into a single line
-                        answereeadh = "_-_".join(line.strip() for line in answereeadht.splitlines())
-                        # Remove the special characters
-                        for tag in tags_sp:
-                            if tag in answereeadh:
-                                answereeadh = answereeadh.replace(tag, ' ')
-                        for tag in tags_nv:
-                            if tag in answereeadh:
-                                answereeadh = answereeadh.replace(tag, '')
+                        answereeadh = html_clean.clean_answer(texteeadh, tags_sp, tags_nv, '')
                         if answereeadh == '':
                             answereeadh = 'Unknown'
                         else:
@@ -1804,16 +1353,7 @@ while v != filenrcert:
                         answereeadh = 'Unknown'
                     else:
                         texteeadh = Dictionaryeeah['answer']['text']
-                        answereeadht = remove_html(texteeadh)
-                        # Combine multiline input into a single line
-                        answereeadh = "_-_".join(line.strip() for line in answereeadht.splitlines())
-                        # Remove the special characters
-                        for tag in tags_sp:
-                            if tag in answereeadh:
-                                answereeadh = answereeadh.replace(tag, ' ')
-                        for tag in tags_nv:
-                            if tag in answereeadh:
-                                answereeadh = answereeadh.replace(tag, '')
+                        answereeadh = html_clean.clean_answer(texteeadh, tags_sp, tags_nv, '')
                         if answereeadh == '':
                             answereeadh = 'Unknown'
                         else:
@@ -1844,16 +1384,7 @@ while v != filenrcert:
                     answerecodh = 'Unknown'
                 else:
                     textecoh = Dictionaryecoh['answer']['text']
-                    answerecoht = remove_html(textecoh)
-                    # Combine multiline input into a single line
-                    answerecoh = "_-_".join(line.strip() for line in answerecoht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerecoh:
-                            answerecoh = answerecoh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerecoh:
-                            answerecoh = answerecoh.replace(tag, '')
+                    answerecoh = html_clean.clean_answer(textecoh, tags_sp, tags_nv, '')
                     if answerecoh == '':
                         answerecoh = 'Unknown'
                     else:
@@ -1885,17 +1416,7 @@ while v != filenrcert:
                     answeraoph = 'Unknown'
                 else:
                     textaoph = Dictionaryaoph['answer']['text']
-                    # Strip html code from answer
-                    answeraopht = remove_html(textaoph)
-                    # Combine multiline input into a single line
-                    answeraoph = "_-_".join(line.strip() for line in answeraopht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeraoph:
-                            answeraoph = answeraoph.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeraoph:
-                            answeraoph = answeraoph.replace(tag, '')
+                    answeraoph = html_clean.clean_answer(textaoph, tags_sp, tags_nv, '')
                     if answeraoph == '':
                         answeraoph = 'Unknown'
                     else:
@@ -1916,16 +1437,7 @@ while v != filenrcert:
                     answerarchoh = 'Unknown'
                 else:
                     textarchh = Dictionaryarchh['answer']['text']
-                    answerarchht = remove_html(textarchh)
-                    # Combine multiline input into a single line
-                    answerarchh = "_-_".join(line.strip() for line in answerarchht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerarchh:
-                            answerarchh = answerarchh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerarchh:
-                            answerarchh = answerarchh.replace(tag, '')
+                    answerarchh = html_clean.clean_answer(textarchh, tags_sp, tags_nv, '')
                     if answerarchh == '':
                         answerarchh = 'Unknown'
                     else:
@@ -1957,17 +1469,7 @@ while v != filenrcert:
                     answerwoah = 'Unknown'
                 else:
                     textwoah = Dictionarywoah['answer']['text']
-                    # Strip html code from answer
-                    answerwoaht = remove_html(textwoah)
-                    # Combine multiline input into a single line
-                    answerwoah = "_-_".join(line.strip() for line in answerwoaht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerwoah:
-                            answerwoah = answerwoah.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerwoah:
-                            answerwoah = answerwoah.replace(tag, '')
+                    answerwoah = html_clean.clean_answer(textwoah, tags_sp, tags_nv, '')
                     if answerwoah == '':
                         answerwoah = 'Unknown'
                     else:
@@ -1986,17 +1488,7 @@ while v != filenrcert:
                     answertermh = 'Unknown'
                 else:
                     texttermh = Dictionarytermh['answer']['text']
-                    # Strip html code from answer
-                    answertermht = remove_html(texttermh)
-                    # Combine multiline input into a single line
-                    answertermh = "_-_".join(line.strip() for line in answertermht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answertermh:
-                            answertermh = answertermh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answertermh:
-                            answertermh = answertermh.replace(tag, '')
+                    answertermh = html_clean.clean_answer(texttermh, tags_sp, tags_nv, '')
                     if answertermh == '':
                         answertermh = 'Unknown'
                     else:
@@ -2016,7 +1508,7 @@ while v != filenrcert:
                 else:
                     textpublh = Dictionarypublh['answer']['text']
                     # Strip html code from answer
-                    answerpublht = remove_html(textpublh)
+                    answerpublht = html_clean.remove_html(textpublh)
                     # Combine multiline input into a single line
                     answerpublh = "_-_".join(line.strip() for line in answerpublht.splitlines())
                     # Remove the special characters
@@ -2044,17 +1536,7 @@ while v != filenrcert:
                     answerrrdh = 'Unknown'
                 else:
                     textrrdh = Dictionaryrrdh['answer']['text']
-                    # Strip html code from answer
-                    answerrrdht = remove_html(textrrdh)
-                    # Combine multiline input into a single line
-                    answerrrdh = "_-_".join(line.strip() for line in answerrrdht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerrrdh:
-                            answerrrdh = answerrrdh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerrrdh:
-                            answerrrdh = answerrrdh.replace(tag, '')
+                    answerrrdh = html_clean.clean_answer(textrrdh, tags_sp, tags_nv, '')
             except:
                 answerrrdh = 'Unknown'
                 pass
@@ -2069,17 +1551,7 @@ while v != filenrcert:
                     answerarh = 'Unknown'
                 else:
                     textrarh = Dictionaryrarh['answer']['text']
-                    # Strip html code from answer
-                    answerarht = remove_html(textrarh)
-                    # Combine multiline input into a single line
-                    answerarh = "_-_".join(line.strip() for line in answerarht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answerarh:
-                            answerarh = answerarh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answerarh:
-                            answerarh = answerarh.replace(tag, '')
+                    answerarh = html_clean.clean_answer(textrarh, tags_sp, tags_nv, '')
             except:
                 answerarh = 'Unknown'
                 pass
@@ -2094,71 +1566,60 @@ while v != filenrcert:
                     answeramh = 'Unknown'
                 else:
                     textramh = Dictionaryramh['answer']['text']
-                    # Strip html code from answer
-                    answeramht = remove_html(textramh)
-                    # Combine multiline input into a single line
-                    answeramh = "_-_".join(line.strip() for line in answeramht.splitlines())
-                    # Remove the special characters
-                    for tag in tags_sp:
-                        if tag in answeramh:
-                            answeramh = answeramh.replace(tag, ' ')
-                    for tag in tags_nv:
-                        if tag in answeramh:
-                            answeramh = answeramh.replace(tag, '')
+                    answeramh = html_clean.clean_answer(textramh, tags_sp, tags_nv, '')
             except:
                 answeramh = 'Unknown'
                 pass
             Req_dataset_proch.append(answeramh)
 
-    # Closing file
-    h.close()
-    id_data_h = {'id': id_list_h}
-    test_listh = pd.DataFrame(id_data_h)
-    test_listh['title'] = title_list_h
-    test_listh['template'] = templates_h
-    test_listh['funder'] = funders_h
-    test_listh['last_updated'] = LastUpdate_h
-    test_listh['file_name'] = file_name_h
-    test_listh['contact_name'] = data_contact_nh
-    test_listh['contact_email'] = data_contact_eh
-    test_listh['plan_version'] = Plan_version_h
-    test_listh['project_title'] = Project_title_h
-    test_listh['Organisation'] = Org_name_h
-    test_listh['Other_org'] = Oth_Org_h
-    test_listh['Project_code'] = Project_code_h
-    test_listh['Other_DMP_url'] = 'Unknown'
-    test_listh['Existing_data'] = data_reuse_h
-    test_listh['New_data'] = data_new_h
-    test_listh['Population_descr'] = popul_h
-    test_listh['Personal_data_type'] = pers_data_type_h
-    test_listh['Informed_consent_type'] = Inf_consent_h
-    test_listh['Other_legal_ground_desc'] = legal_ground_hd
-    test_listh['Other_legal_ground'] = legal_ground_h
-    test_listh['Personal_data_cat_desc'] = Pers_cat_desc_h
-    test_listh['Personal_data_spec_cat'] = Pers_data_cat_h
-    test_listh['Informed_Consent_Exemption'] = Consent_exemption_h
-    test_listh['Data_security_measures'] = sec_measures_h
-    test_listh['Tools_during_res_descr'] = tools_used_during_desch
-    test_listh['Tools_during_research'] = tools_used_during_h
-    test_listh['Other_tools_during'] = tools_other_during_h
-    test_listh['Data_transfer'] = Data_transfer_h
-    test_listh['Data_transfer_desc'] = Data_transfer_ah
-    test_listh['Data_transfer_EEA'] = Data_transfer_eeah
-    test_listh['Transfer_EEA_desc'] = Data_transfer_eea_dh
-    test_listh['Eth_Com_app_needed'] = Ethics_com_approvalh
-    test_listh['Eth_Com_Approved'] = Ethics_com_datah
-    test_listh['Arch_and_or_Publ'] = Arch_and_Publh
-    test_listh['Which_archives'] = Archivesh
-    test_listh['Archive_options'] = Archives_optionsh
-    test_listh['Other_archives'] = Other_Archivesh
-    test_listh['Archive_period'] = Archive_periodh
-    test_listh['Dataset_Publish'] = Dataset_Publh
-    test_listh['Researcher_Resp_during'] = Res_Resp_duringh
-    test_listh['Person_resp_after'] = Person_resp_afterh
-    test_listh['Proced_to_req_dataset'] = Req_dataset_proch
-    test_listh['Faculty_situated'] = Fac_situated2
-    DMP_cert_data = pd.concat([DMP_cert_data, test_listh], ignore_index=True)
+    DMP_cert_rows.add({
+        'id': id_list_h,
+        'title': title_list_h,
+        'template': templates_h,
+        'funder': funders_h,
+        'last_updated': LastUpdate_h,
+        'file_name': file_name_h,
+        'contact_name': data_contact_nh,
+        'contact_email': data_contact_eh,
+        'plan_version': Plan_version_h,
+        'project_title': Project_title_h,
+        'Organisation': Org_name_h,
+        'Other_org': Oth_Org_h,
+        'Project_code': Project_code_h,
+        'Other_DMP_url': 'Unknown',
+        'Existing_data': data_reuse_h,
+        'New_data': data_new_h,
+        'Population_descr': popul_h,
+        'Personal_data_type': pers_data_type_h,
+        'Informed_consent_type': Inf_consent_h,
+        'Other_legal_ground_desc': legal_ground_hd,
+        'Other_legal_ground': legal_ground_h,
+        'Personal_data_cat_desc': Pers_cat_desc_h,
+        'Personal_data_spec_cat': Pers_data_cat_h,
+        'Informed_Consent_Exemption': Consent_exemption_h,
+        'Data_security_measures': sec_measures_h,
+        'Tools_during_res_descr': tools_used_during_desch,
+        'Tools_during_research': tools_used_during_h,
+        'Other_tools_during': tools_other_during_h,
+        'Data_transfer': Data_transfer_h,
+        'Data_transfer_desc': Data_transfer_ah,
+        'Data_transfer_EEA': Data_transfer_eeah,
+        'Transfer_EEA_desc': Data_transfer_eea_dh,
+        'Eth_Com_app_needed': Ethics_com_approvalh,
+        'Eth_Com_Approved': Ethics_com_datah,
+        'Arch_and_or_Publ': Arch_and_Publh,
+        'Which_archives': Archivesh,
+        'Archive_options': Archives_optionsh,
+        'Other_archives': Other_Archivesh,
+        'Archive_period': Archive_periodh,
+        'Dataset_Publish': Dataset_Publh,
+        'Researcher_Resp_during': Res_Resp_duringh,
+        'Person_resp_after': Person_resp_afterh,
+        'Proced_to_req_dataset': Req_dataset_proch,
+        'Faculty_situated': Fac_situated2,
+    })
     v = v + 1
+DMP_cert_data = DMP_cert_rows.build()
 
 # Drop DMPs that no longer exist and have null data in the overview
 DMP_cert_data = DMP_cert_data.dropna(subset=['id'])
@@ -2180,80 +1641,56 @@ filenrf = str(filenrfm)
 metalist = Register_sensitive_research_temp['id'].values.tolist()
 dmps = metalist
 
-# api2 currently has a limit somewhere beyond 150 items
+# api2 has a limit on the number of DMPs per request somewhere beyond 150.
 # Step 8 Use metalist to download the meta for DMPS as separate file
-if len(dmps) < 151:
-    filenrf = str(len(dmps))
-    print('Gettings data for ' + filenrf + ' DMPs')
-    plans = api2.retrieve_plans(dmps)
-    pages = list(plans)
-    # save json file of the DMP
-    with open(f'DMP_stats\\'+runyear+'\meta_all2\DMPS_metadata0.json', 'w') as f:
-        f.write(json.dumps(pages))
-else:
-    # divide up the full list in brackets of 150
-    fmllen = len(dmps)
-    nrofml = round(len(dmps) / 150) + 1
-    print("Nr. of sublists to generate: ", nrofml)
-
-    def getnums(s, e, i):
-        return list(range(s, e, i))
-
-    nroflists = (getnums(0, int(nrofml), 1))
-
-    snrofml = 0
-    startmlnr = 0
-    while snrofml < fmllen:
-        startl = snrofml
-        endl = snrofml + 150
-        mlistnew = dmps[startl: endl]
-        print("Nr. of DMPS in the list it is fetching data for: ", len(mlistnew))
-        plans = api2.retrieve_plans(mlistnew)
-        pages = list(plans)
-        # save json file of the DMP
-        with open(f'DMP_stats\\'+runyear+'\meta_all2/DMPS_metadata'+str(startmlnr)+'.json', 'w') as f:
-            f.write(json.dumps(pages))
-        snrofml = snrofml + 150
-        startmlnr = startmlnr + 1
+# The DMPs are fetched in chunks of batching.CHUNK_SIZE, a file per chunk: DMPs that fail are tried
+# once more, a chunk where nothing comes back (an outage) is tried again after a pause.
+# The plans of a chunk are fetched FETCH_WORKERS at a time (api_v1, config.py).
+print('Gettings data for ' + filenrf + ' DMPs')
+# remove the files of the previous run, the number of chunks can differ
+for oldfile in Path('DMP_stats\\'+runyear+'\meta_all2').glob('DMPS_metadata*.json*'):
+    oldfile.unlink()
+startmlnr = 0
+for mlistnew, pages in batching.fetch_in_chunks(partial(api2.retrieve_plans, workers=api2.FETCH_WORKERS), dmps):
+    print("Nr. of DMPS in the list it fetched data for: ", len(mlistnew))
+    # save json file of the DMPs
+    archive.write_pages('DMP_stats\\'+runyear+'\meta_all2/DMPS_metadata'+str(startmlnr)+'.json', pages)
+    startmlnr = startmlnr + 1
 
 # Step 9 Use Metadata json file to get data for each dmp
 # Get list of all metadata files only in the given directory
 metapath = 'U:\Werk\Data Management\Python\Files\DMP_Online\DMP_stats\\'+runyear+'\meta_all2'
 
-metadmplist = lambda x: os.path.isfile(os.path.join(metapath, x))
-metafiles_list = filter(metadmplist, os.listdir(metapath))
-
-# Create a table with the list as input
-metadmp_list = pd.DataFrame(metafiles_list, columns=['File_name'])
+# Create a table with the json files written in Step 8 (plain or compressed)
+metadmp_list = file_scan.listing(file_scan.cached_scan(metapath, suffixes='.json'))
 
 metafilenr = metadmp_list.shape[0]
 
 print('Number of Metadata Json files to process: ', metafilenr)
 
-DMP_meta_data = pd.DataFrame()
+# Collect the rows of all files and make them into one table after the loop
+DMP_meta_rows = records.RecordBuilder(['id', 'project_start', 'project_end'])
 m = 0
 while m != metafilenr:
     logger.debug(f'Copying and adding meta data from ' + metadmp_list.File_name[m])
-    nf = open(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\{runyear}\meta_all2/{metadmp_list.File_name[m]}', 'r')
-    # returns JSON object as a dictionary
-    data_meta = json.load(nf)
+    # reads the pages one at a time, also from compressed files
+    data_meta = archive.iter_pages(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\{runyear}\meta_all2/{metadmp_list.File_name[m]}')
     # Iterating through the metadata json file to get specific items for all DMPs
     id_list_md = []
     project_start = []
     project_end = []
     for l1 in data_meta:
         for l2 in l1:
-            id_list_md.append(str(l2['dmp']['dmp_id']['identifier'][41:]))
+            id_list_md.append(api2.plan_id(l2))
             project_start.append(l2['dmp']['project'][0]['start'][0:10])
             project_end.append(l2['dmp']['project'][0]['end'][0:10])
-    # Closing file
-    nf.close()
-    id_data_md = {'id': id_list_md}
-    test_listmd = pd.DataFrame(id_data_md)
-    test_listmd['project_start'] = project_start
-    test_listmd['project_end'] = project_end
-    DMP_meta_data = pd.concat([DMP_meta_data, test_listmd], ignore_index=True)
+    DMP_meta_rows.add({
+        'id': id_list_md,
+        'project_start': project_start,
+        'project_end': project_end,
+    })
     m = m + 1
+DMP_meta_data = DMP_meta_rows.build()
 
 DMP_meta_data.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\\overview2\\register_metadata_list_'+runday+'.csv', encoding='utf-8')
 
@@ -2302,6 +1739,7 @@ Path('DMP_stats\\'+runyear+'\Final').mkdir(parents=True, exist_ok=True)
 
 # Get the first list based on the older DMP templates
 firstpath = 'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\\overview'
+# anything in the folder counts, as before (only whether it is empty matters here)
 firstdir = os.listdir(firstpath)
 if len(firstdir) == 0:
     Register_sensitive_research.to_csv(f'U:\Werk\Data Management\Python\\Files\DMP_Online\DMP_stats\\'+runyear+'\\Final\\registerlist_'+runday+'.csv', encoding='utf-8')
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import rate_limit
+
+# connection settings, can be overridden in config.py
+POOL_SIZE = getattr(config, 'POOL_SIZE', 10)
+TIMEOUT = getattr(config, 'TIMEOUT', (10, 120))  # (connect, read) in seconds
+RETRIES = getattr(config, 'RETRIES', 5)
+BACKOFF = getattr(config, 'BACKOFF', 1.0)  # base delay in seconds, doubled on every retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+_lock = threading.Lock()
+
+
+def configure(pool_size=None, timeout=None, retries=None, backoff=None):
+    """ change the connection settings, the session is rebuilt on next use
+    :param pool_size: max. number of keep-alive connections kept per host
+    :param timeout: seconds (or (connect, read) tuple) before a request is given up
+    :param retries: number of retries for connection errors and 5xx responses
+    :param backoff: base delay in seconds between retries
+    """
+    global POOL_SIZE, TIMEOUT, RETRIES, BACKOFF, _session
+    with _lock:
+        if pool_size is not None:
+            POOL_SIZE = pool_size
+        if timeout is not None:
+            TIMEOUT = timeout
+        if retries is not None:
+            RETRIES = retries
+        if backoff is not None:
+            BACKOFF = backoff
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get_session():
+    """ returns the shared session, keeps connections to dmponline alive between calls
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            # retries are handled in request(), the adapter only pools connections
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE,
+                                  max_retries=0)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def backoff_delay(attempt):
+    """ exponential backoff with full jitter
+    """
+    return random.uniform(0, BACKOFF * 2 ** attempt)
+
+
+def retry_after(resp):
+    """ seconds to wait according to the Retry-After header (None if not given)
+    """
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def request(method, url, **kwargs):
+    """ send a request over the shared session
+    waits for the rate limiter, retries connection errors and 5xx responses
+    with jittered backoff and 429 responses after the time the server asks for
+    :returns the last response (the caller checks the status code)
+    """
+    kwargs.setdefault('timeout', TIMEOUT)
+    session = get_session()
+    attempt = 0
+    while True:
+        rate_limit.acquire()
+        delay = None
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= RETRIES:
+                raise
+            print(f'connection error ({e.__class__.__name__}), retrying')
+        else:
+            if resp.status_code == 429:
+                # throttled: the limiter holds back every thread, not just this one
+                delay = retry_after(resp)
+                rate_limit.throttle(delay)
+            if resp.status_code not in RETRY_STATUSES or attempt >= RETRIES:
+                return resp
+            print(f'api returned {resp.status_code}, retrying')
+        if delay is None:
+            time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
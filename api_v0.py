@@ -1,26 +1,35 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+
+import api_client as client
+import config
+import json_codec
 from config import CLIENT_SECRET
 
-DMP_ONLINE_URL = 'https://dmponline.vu.nl/api/v0'
+DMP_ONLINE_HOST = getattr(config, 'DMP_ONLINE_HOST', 'https://dmponline.vu.nl')
+DMP_ONLINE_URL = f'{DMP_ONLINE_HOST}/api/v0'
 
 DEFAULT_HEADERS = {
     'Content-Type': 'application/json',
     'Authorization': f'Token token={CLIENT_SECRET}'
 }
 
-def retrieve_plans(identifier=None):
+def retrieve_plans(identifier=None, prefetch=1):
     """ retrieves dmps for a given id (or all)
     :param identifier: plan number for which to retrieve full-text (None=all)
+    :param prefetch: number of page requests to keep in flight (1=one page at a time)
     :returns generator for page requests
     """
+    if prefetch > 1:
+        yield from _retrieve_plans_prefetch(identifier, prefetch)
+        return
     # api used to provide a pages count, but that's not the case in current version
     more_pages = True
     page = 1
     while more_pages:
-        params = {'page': page}
-        if identifier:
-            params['plan'] = identifier
-        data = request_api(params)
+        data = request_api(page_params(page, identifier))
         if data:
             print(f'retrieved page {page}')
             yield data
@@ -30,12 +39,48 @@ def retrieve_plans(identifier=None):
             print(f'no more pages')
 
 
+def _retrieve_plans_prefetch(identifier, window):
+    """ keeps a sliding window of page requests in flight and yields them in order
+    the end is only known when an empty page comes back, so the pages requested
+    beyond it are wasted; outstanding requests are cancelled at that point
+    """
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        in_flight = deque()
+        next_page = 1
+        for _ in range(window):
+            in_flight.append(executor.submit(request_api, page_params(next_page, identifier)))
+            next_page += 1
+        page = 1
+        try:
+            while in_flight:
+                data = in_flight.popleft().result()
+                if not data:
+                    print(f'no more pages')
+                    break
+                print(f'retrieved page {page}')
+                # top up the window before handing the page to the caller
+                in_flight.append(executor.submit(request_api, page_params(next_page, identifier)))
+                next_page += 1
+                yield data
+                page += 1
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def page_params(page, identifier=None):
+    params = {'page': page}
+    if identifier:
+        params['plan'] = identifier
+    return params
+
+
 def request_api(params):
     target = f'{DMP_ONLINE_URL}/plans'
-    resp = requests.get(target, headers=DEFAULT_HEADERS, params=params)
+    resp = client.get(target, headers=DEFAULT_HEADERS, params=params)
 
     if resp.status_code == 200:
-        data = resp.json()
+        data = json_codec.loads(resp.content)
         if len(data) == 0:
             return None  # [] returned when out of pages
         else:
@@ -44,4 +89,5 @@ def request_api(params):
         print('api error')
         print(resp.status_code)
         print(resp.text)
-        return None
+        # an error is not the end of the pages, don't let the caller think it is
+        raise requests.HTTPError(f'api error {resp.status_code} for {resp.url}', response=resp)
@@ -1,8 +1,27 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
 import requests
+
+import api_client as client
+import config
+import json_codec
 from config import CLIENT_SECRET, EMAIL
 
 
-DMP_ONLINE_URL = 'https://dmponline.vu.nl/api/v1'
+DMP_ONLINE_HOST = getattr(config, 'DMP_ONLINE_HOST', 'https://dmponline.vu.nl')
+DMP_ONLINE_URL = f'{DMP_ONLINE_HOST}/api/v1'
+
+# token cache settings, can be overridden in config.py
+TOKEN_CACHE_FILE = getattr(config, 'TOKEN_CACHE_FILE', None)  # None = keep in memory only
+TOKEN_LIFETIME = 7200  # seconds, used when the server doesn't say
+TOKEN_MARGIN = 60  # refresh this many seconds before the token expires
+
+# plans fetched at the same time by the scripts (retrieve_plans(workers=...)), can be overridden in config.py
+FETCH_WORKERS = getattr(config, 'FETCH_WORKERS', 8)
 
 DEFAULT_HEADERS = {
     'Content-Type': 'application/x-www-form-urlencoded;charset=UTF-8',
@@ -10,41 +29,147 @@ DEFAULT_HEADERS = {
 }
 
 
+_token = {'access_token': None, 'expires_at': 0}
+_token_lock = threading.Lock()
+
+
 def retrieve_auth_token():
+    token, _ = authenticate()
+    return token
+
+
+def authenticate():
+    """ requests a new token
+    :returns (token, expires_at) or (None, 0) if it failed
+    """
     payload = {
         'grant_type': 'authorization_code',
         'email': EMAIL,
         'code': CLIENT_SECRET
     }
     target = f'{DMP_ONLINE_URL}/authenticate'
-    resp = requests.post(target, json=payload, headers=DEFAULT_HEADERS)
+    resp = client.post(target, json=payload, headers=DEFAULT_HEADERS)
 
     token = None
+    expires_at = 0
     if resp.status_code == 200:
-        response = resp.json()
+        response = json_codec.loads(resp.content)
         token = response['access_token']
+        lifetime = response.get('expires_in') or TOKEN_LIFETIME
+        expires_at = response.get('created_at', time.time()) + lifetime
         print('fetched token')
     else:
         print('could not fetch token')
-    return token
+    return token, expires_at
+
+
+def get_token(stale=None):
+    """ returns a valid token from the cache, fetching a new one when needed
+    safe to call from several threads, only one of them authenticates
+    :param stale: token that was rejected by the server, forces a refresh
+        unless another thread already replaced it
+    """
+    with _token_lock:
+        cached = _token['access_token']
+        if stale is not None and cached == stale:
+            cached = None
+        if cached is None and stale is None:
+            _token.update(_read_token_file())
+            cached = _token['access_token']
+        if cached is None or time.time() > _token['expires_at'] - TOKEN_MARGIN:
+            token, expires_at = authenticate()
+            _token.update({'access_token': token, 'expires_at': expires_at})
+            if token is not None:
+                _write_token_file()
+        return _token['access_token']
+
+
+def _read_token_file():
+    if TOKEN_CACHE_FILE is None or not os.path.exists(TOKEN_CACHE_FILE):
+        return {}
+    try:
+        cached = json_codec.load_file(TOKEN_CACHE_FILE)
+        return {'access_token': cached['access_token'], 'expires_at': cached['expires_at']}
+    except (ValueError, KeyError):
+        return {}
+
+
+def _write_token_file():
+    if TOKEN_CACHE_FILE is None:
+        return
+    json_codec.dump_file(_token, TOKEN_CACHE_FILE)
+
+
+def plan_id(item):
+    """ the plan id of an item retrieve_plans returns: the end of its dmp_id url
+    """
+    return item['dmp']['dmp_id']['identifier'].rstrip('/').rsplit('/', 1)[-1]
 
 
 def retrieve_plan(token, id):
     target = f'{DMP_ONLINE_URL}/plans/{id}'
     headers = DEFAULT_HEADERS.copy()
     headers['Authorization'] = f'Bearer {token}'
-    resp = requests.get(target, headers = headers)
-    
+    resp = client.get(target, headers = headers)
+    if resp.status_code == 401:
+        # token expired or was revoked, refresh once and try again
+        headers['Authorization'] = f'Bearer {get_token(stale=token)}'
+        resp = client.get(target, headers = headers)
+
     data = None
     if resp.status_code == 200:
-        data = resp.json()['items']
+        data = json_codec.loads(resp.content)['items']
     else:
         print('api error')
     
     return data
 
 
-def retrieve_plans(ids: list):
-    token = retrieve_auth_token()
-    for id in ids:
-        yield retrieve_plan(token, id)
+def retrieve_plans(ids: list, workers=1, ordered=True):
+    """ retrieves the metadata for the given plan ids
+    :param ids: plan numbers
+    :param workers: max. number of plans fetched at the same time
+    :param ordered: yield results in the order of ids, otherwise as they
+        complete as (id, data) tuples
+    :returns generator of plan data (None for plans that could not be fetched)
+    """
+    def fetch(id):
+        # the cache hands out the current token, refreshed before it expires
+        try:
+            return retrieve_plan(get_token(), id)
+        except requests.RequestException as e:
+            # still failing after the retries of api_client: this plan only, not the others
+            print(f'could not fetch plan {id} ({e.__class__.__name__})')
+            return None
+
+    if workers <= 1:
+        for id in ids:
+            yield fetch(id) if ordered else (id, fetch(id))
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        ids = iter(ids)
+        pending = deque()
+
+        def submit_more():
+            # only keep a bounded number of ids submitted, so long id lists
+            # (or generators) are not turned into futures all at once
+            for id in ids:
+                pending.append((id, executor.submit(fetch, id)))
+                if len(pending) >= workers * 2:
+                    break
+
+        try:
+            submit_more()
+            while pending:
+                if ordered:
+                    id, future = pending.popleft()
+                    yield future.result()
+                else:
+                    done, _ = wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                    for item in [p for p in pending if p[1] in done]:
+                        pending.remove(item)
+                        yield item[0], item[1].result()
+                submit_more()
+        finally:
+            for _, future in pending:
+                future.cancel()
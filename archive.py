@@ -0,0 +1,325 @@
+import gzip
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always there
+    zstandard = None
+
+import config
+import json_codec
+
+# compression of the files that are written: 'zstd', 'gzip' or None (plain json).
+# Files are read whatever their compression, also the older plain json files.
+COMPRESSION = getattr(config, 'ARCHIVE_COMPRESSION', 'zstd' if zstandard else 'gzip')
+SUFFIXES = {'zstd': '.zst', 'gzip': '.gz'}
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+# first bytes of a compressed file
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# bytes that are read (and decompressed) at a time
+READ_SIZE = 1 << 20
+# start of the files written by write_pages, which have one page per line
+PAGE_PER_LINE = b'[\n'
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def require_zstandard():
+    if zstandard is None:
+        raise ImportError('zstd compressed files need zstandard (pip install zstandard)')
+
+
+def logical_name(name):
+    """ name of a file without its compression suffix: 123.json.zst -> 123.json
+    """
+    for suffix in SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def variants(path):
+    """ the names the json file path can be stored under: plain and compressed
+    """
+    path = logical_name(path)
+    return [path] + [path + suffix for suffix in SUFFIXES.values()]
+
+
+def find(path):
+    """ the file the json file path is stored in, plain or compressed
+    :returns the path of the file, None if there is none
+    """
+    if os.path.exists(path):
+        return path
+    for variant in variants(path):
+        if os.path.exists(variant):
+            return variant
+    return None
+
+
+def compression_of(f):
+    """ 'zstd', 'gzip' or None, from the first bytes of the (binary) file f
+    """
+    magic = f.read(4)
+    f.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+@contextmanager
+def open_binary(path):
+    """ the json content of an archive file as a binary stream that is
+    decompressed while it is read
+    :param path: the file, or its plain name (dmps/2024-01-01.json) if it is stored compressed
+    """
+    found = find(path)
+    if found is None:
+        raise FileNotFoundError(f'no archive file for {path}')
+    with open(found, 'rb') as f:
+        compression = compression_of(f)
+        if compression == 'gzip':
+            with gzip.GzipFile(fileobj=f, mode='rb') as stream:
+                yield stream
+        elif compression == 'zstd':
+            require_zstandard()
+            with zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=False) as stream:
+                yield stream
+        else:
+            yield f
+
+
+@contextmanager
+def open_plain(path):
+    """ a real (memory mappable) file with the json content: the file itself if it
+    is plain json, otherwise a temporary file it is decompressed into
+    """
+    found = find(path)
+    if found is None:
+        raise FileNotFoundError(f'no archive file for {path}')
+    with open(found, 'rb') as f:
+        if compression_of(f) is None:
+            yield f
+            return
+    with open_binary(found) as stream, tempfile.TemporaryFile() as tmp:
+        shutil.copyfileobj(stream, tmp, READ_SIZE)
+        tmp.flush()
+        tmp.seek(0)
+        yield tmp
+
+
+class LineReader:
+    """ splits a binary stream into lines, reading (and decompressing) READ_SIZE bytes or more at a time
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = b''
+        self.pos = 0
+
+    def fill(self):
+        """ reads more bytes after the unread part of the buffer (at least as many
+        as are unread, so a very long line isn't searched many times)
+        :returns False at the end of the file
+        """
+        chunk = self.stream.read(max(READ_SIZE, len(self.buf) - self.pos))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def __iter__(self):
+        while True:
+            end = self.buf.find(b'\n', self.pos)
+            if end < 0:
+                if self.fill():
+                    continue
+                if self.buf:
+                    yield self.buf
+                return
+            line = self.buf[self.pos:end]
+            self.pos = end + 1
+            yield line
+
+
+class TextPageReader:
+    """ reads the elements of a json list ([page, page, ...]) written on one line, as the
+    older files are, from a text stream one at a time. Only the text of the current element is kept.
+    """
+
+    def __init__(self, text, buf=''):
+        self.text = text
+        self.buf = buf
+        self.pos = 0
+
+    def fill(self, size=READ_SIZE):
+        """ reads more text after the unread part of the buffer
+        :returns False at the end of the file
+        """
+        chunk = self.text.read(size)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def next_char(self):
+        """ the next character that is not whitespace ('' at the end of the file)
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def value(self):
+        self.next_char()  # raw_decode doesn't skip whitespace
+        while True:
+            try:
+                value, end = json_codec.raw_decode(self.buf, self.pos)
+            except ValueError:
+                # incomplete, read as much again so a long page doesn't get decoded many times
+                if not self.fill(max(READ_SIZE, len(self.buf))):
+                    raise
+                continue
+            self.buf = self.buf[end:]
+            self.pos = 0
+            return value
+
+    def expect(self, char):
+        found = self.next_char()
+        if found != char:
+            raise ValueError(f'expected {char!r}, found {found!r}')
+        self.pos += 1
+
+    def items(self):
+        self.expect('[')
+        if self.next_char() == ']':
+            return
+        while True:
+            yield self.value()
+            char = self.next_char()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f'expected , or ], found {char!r}')
+
+
+def iter_pages(path):
+    """ the pages of an archive file, one at a time as the file is read and decompressed,
+    so neither the whole file nor all of its pages are in memory at once
+    Files written by write_pages have a page per line: each line is decoded by json_codec.
+    Older files (all on one line) are decoded page by page with the standard library.
+    :param path: the file, or its plain name if it is stored compressed
+    :returns generator of pages (lists of plans), nothing for an empty file
+    """
+    with open_binary(path) as stream:
+        head = stream.read(len(PAGE_PER_LINE))
+        if head == PAGE_PER_LINE:
+            for line in LineReader(stream):
+                line = line.strip()
+                if line == b']':
+                    return
+                if line:
+                    yield json_codec.loads(line[:-1] if line.endswith(b',') else line)
+            raise ValueError(f'{path} ends before the closing ]')
+        reader = TextPageReader(io.TextIOWrapper(stream, encoding='utf-8'), head.decode('utf-8'))
+        if reader.next_char() == '':
+            return
+        yield from reader.items()
+
+
+def load(path):
+    """ all pages of an archive file, like json.load on the plain file
+    """
+    return list(iter_pages(path))
+
+
+def open_binary_writer(path, compression):
+    """ binary stream that writes (and compresses) to path
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(path, 'wb', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        require_zstandard()
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, 'wb'))
+    return open(path, 'wb')
+
+
+def write_pages(path, pages, compression=COMPRESSION):
+    """ writes pages to a json file as they come in, one page per line
+    gives the same data as json_codec.dumps(list(pages)) without keeping all pages
+    (or one big string) in memory. The file is written under a temporary name
+    and renamed when complete, so a crash never leaves a truncated file behind.
+    :param path: json file to write, the compression suffix is added to it (.zst or .gz)
+    and other versions of the file (e.g. an older plain one) are removed
+    :param pages: iterable (e.g. generator from api.retrieve_plans) of json-serializable pages
+    :param compression: 'zstd', 'gzip' or None for plain json
+    :returns number of pages written
+    """
+    target = logical_name(path) + SUFFIXES.get(compression, '')
+    tmp = f'{target}.tmp'
+    count = 0
+    try:
+        with open_binary_writer(tmp, compression) as f:
+            f.write(PAGE_PER_LINE)
+            for page in pages:
+                if count:
+                    f.write(b',\n')
+                f.write(json_codec.dumpb(page))
+                count += 1
+            f.write(b'\n]\n')
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    for variant in variants(path):
+        if variant != target and os.path.exists(variant):
+            os.remove(variant)
+    return count
+
+
+def compress_file(path, compression=COMPRESSION):
+    """ rewrites a plain json file compressed (one page per line) and removes the plain file
+    :returns path of the compressed file
+    """
+    write_pages(path, iter_pages(path), compression)
+    return logical_name(path) + SUFFIXES[compression]
+
+
+def compress_folder(folder, compression=COMPRESSION):
+    """ compresses the plain json files with a list of pages in folder
+    (other json files, like catalog.json, are left as they are)
+    :returns (number of files, size before, size after)
+    """
+    count = before = after = 0
+    with os.scandir(folder) as entries:
+        for entry in sorted(entries, key=lambda entry: entry.name):
+            if not entry.is_file() or not entry.name.endswith('.json'):
+                continue
+            with open(entry.path, 'rb') as f:
+                if f.read(64).lstrip()[0:1] != b'[':
+                    continue
+            before += entry.stat().st_size
+            after += os.path.getsize(compress_file(entry.path, compression))
+            count += 1
+    return count, before, after
+
+
+if __name__ == "__main__":
+    # python archive.py compress dmps: compress the plain daily files that are already there
+    if len(sys.argv) == 3 and sys.argv[1] == 'compress':
+        count, before, after = compress_folder(sys.argv[2])
+        print(f'{count} files compressed with {COMPRESSION}: {before} -> {after} bytes')
+    else:
+        print('usage: python archive.py compress <folder with json files>')
@@ -0,0 +1,61 @@
+import time
+
+import requests
+
+CHUNK_SIZE = 150  # ids per chunk (and per metadata file of the scripts)
+OUTAGE_RETRIES = 3  # times a chunk where nothing came back is tried again
+OUTAGE_BACKOFF = 30  # seconds before the first retry of such a chunk, doubled every time
+
+
+def fetch_in_chunks(fetch, ids, chunk_size=CHUNK_SIZE):
+    """ fetches ids in chunks, ids that come back None are tried once more, a chunk where
+    nothing comes back (an outage) after a pause
+    :param fetch: takes a list of ids and yields a result per id (None if it failed), e.g. api_v1.retrieve_plans
+    :returns generator of (ids, results) per chunk, without the ids that failed
+    """
+    ids = list(ids)
+    todo = [ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)]
+    tried = set()  # ids that came back None once
+    failed = []
+    outages = 0
+    while todo:
+        chunk = todo.pop(0)
+        results = []
+        try:
+            for result in fetch(chunk):
+                results.append(result)
+        except requests.RequestException as e:
+            # keep what came back, the ids after it count as not fetched
+            print(f'chunk of {len(chunk)} stopped after {len(results)} ids ({e.__class__.__name__})')
+        results += [None] * (len(chunk) - len(results))
+
+        done = [(id, result) for id, result in zip(chunk, results) if result is not None]
+        missing = [id for id, result in zip(chunk, results) if result is None]
+        if done:
+            outages = 0
+            yield [id for id, _ in done], [result for _, result in done]
+        for id in missing:
+            if id in tried:
+                print(f'could not fetch {id}')
+                failed.append(id)
+        new = [id for id in missing if id not in tried]
+        if not new:
+            continue
+        if not done:
+            # nothing came back: wait for the server, the ids themselves may be fine
+            outages += 1
+            if outages > OUTAGE_RETRIES:
+                print(f'nothing came back {outages} times in a row, leaving out {len(new)} ids')
+                failed.extend(new)
+                outages = 0
+                continue
+            delay = OUTAGE_BACKOFF * 2 ** (outages - 1)
+            print(f'nothing came back for {len(new)} ids, trying again in {delay:.0f}s')
+            time.sleep(delay)
+            todo.insert(0, new)
+        else:
+            tried.update(new)
+            todo.insert(0, new)
+            print(f'retrying {len(new)} ids')
+    if failed:
+        print(f'{len(failed)} ids could not be fetched: {failed}')
@@ -1 +1,27 @@
 CLIENT_SECRET = ''
+EMAIL = ''  # the account of the api v1 token
+
+# optional connection settings (see api_client.py for the defaults)
+# POOL_SIZE = 10
+# TIMEOUT = (10, 120)
+# RETRIES = 5
+# BACKOFF = 1.0
+
+# optional file to keep the api v1 token between runs (default: memory only)
+# TOKEN_CACHE_FILE = 'token.json'
+
+# optional number of plans the scripts fetch from api v1 at the same time (default 8)
+# FETCH_WORKERS = 8
+
+# optional request rate shared by api v0 and v1 (None = no limit)
+# RATE = 5.0  # requests per second
+# BURST = 10
+
+# optional other server, e.g. the local mock_server.py
+# DMP_ONLINE_HOST = 'http://localhost:8000'
+
+# optional compression of the json files that are written: 'zstd' (needs zstandard), 'gzip' or None
+# ARCHIVE_COMPRESSION = 'gzip'
+
+# optional json library: 'orjson', 'msgspec' or 'json' (default: the fastest one installed)
+# JSON_BACKEND = 'json'
@@ -0,0 +1,93 @@
+import csv
+import os
+import shutil
+
+# the line ending pandas uses when to_csv writes to a path
+LINE_TERMINATOR = os.linesep
+
+
+class PageWriter:
+    """ writes the table of a day to a csv file a page at a time, so only the rows of one page
+    are in memory. The pages can have different columns (a funder field that only some plans
+    have): their rows go to a temporary file as they come, close writes the csv with the
+    columns of all pages (in the order they first appeared, '' where a page lacks a column).
+    The csv file only appears, complete, when close is done.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows_path = f'{path}.rows.tmp'
+        self.rows_file = open(self.rows_path, 'w', newline='', encoding='utf-8')
+        # the columns of every page (that had rows), with its number of rows
+        self.pages = []
+        self.columns = {}
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def add(self, plans_df):
+        """ appends the rows of one page
+        :returns number of rows added
+        """
+        if not len(plans_df):
+            self.columns.update((column, None) for column in plans_df.columns)
+            return 0
+        plans_df.to_csv(self.rows_file, header=False, index=False, lineterminator=LINE_TERMINATOR)
+        self.pages.append((list(plans_df.columns), len(plans_df)))
+        self.columns.update((column, None) for column in plans_df.columns)
+        self.rows += len(plans_df)
+        return len(plans_df)
+
+    def close(self):
+        """ writes the csv file: the header and the rows of all pages
+        :returns path of the csv file
+        """
+        self.rows_file.close()
+        columns = list(self.columns)
+        tmp = f'{self.path}.tmp'
+        try:
+            with open(tmp, 'w', newline='', encoding='utf-8') as output, \
+                    open(self.rows_path, newline='', encoding='utf-8') as rows:
+                writer = csv.writer(output, lineterminator=LINE_TERMINATOR)
+                if columns:
+                    writer.writerow(columns)
+                else:
+                    # like to_csv of an empty DataFrame
+                    output.write(LINE_TERMINATOR)
+                if all(page_columns == columns for page_columns, _ in self.pages):
+                    shutil.copyfileobj(rows, output)
+                else:
+                    # rows of pages with other columns are put in the columns of the csv
+                    reader = csv.reader(rows)
+                    for page_columns, count in self.pages:
+                        if page_columns == columns:
+                            for _ in range(count):
+                                writer.writerow(next(reader))
+                            continue
+                        positions = {column: position for position, column in enumerate(page_columns)}
+                        order = [positions.get(column) for column in columns]
+                        for _ in range(count):
+                            row = next(reader)
+                            writer.writerow(['' if position is None else row[position] for position in order])
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        finally:
+            os.remove(self.rows_path)
+        return self.path
+
+    def discard(self):
+        """ stops without writing the csv file (e.g. when the download failed)
+        """
+        self.rows_file.close()
+        if os.path.exists(self.rows_path):
+            os.remove(self.rows_path)
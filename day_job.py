@@ -1,63 +1,429 @@
 import api_v0 as api
+import argparse
+import archive
+import csv_output
+import html_clean
+import parquet_output
+import partitions
+import plan_store
+import plan_versions
+import rate_limit
 import pandas as pd
-import json
 from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
-from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import os
+import sys
+import threading
+import time
+
+# number of page requests kept in flight while downloading
+PREFETCH = 4
+# formats to store the daily table in: 'csv' and/or 'parquet' (needs pyarrow)
+OUTPUT_FORMATS = ['csv']
+# handle the day a page at a time (csv output only, parquet needs the whole day)
+STREAMING = True
+# pages in the transform pool at the same time (stream_day)
+PAGES_IN_TRANSFORM = 8
+# days downloaded at the same time by backfill
+BACKFILL_WORKERS = 4
+# number of cleaned html texts kept to reuse (see without_markup)
+MARKUP_CACHE_SIZE = 4096
+# processes that transform the pages, None for all cores
+TRANSFORM_WORKERS = None
+# fewer plans than this are transformed without the pool (transform_parallel)
+PARALLEL_MIN_PLANS = 200
+# tasks per worker process in transform_parallel
+CHUNKS_PER_WORKER = 4
+
+# one day at a time updates the plan store and version history (backfill)
+_store_lock = threading.Lock()
 
 
 def main():
     """ get yesterday's DMPs (retroactive data jobs)
     """
     yesterday = str((datetime.today() - timedelta(days=1)).date())
-    plans = api.retrieve_plans(yesterday)
+    pool = transform_pool()
+    try:
+        get_day(yesterday, pool=pool)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f'rate limiter: {rate_limit.stats()}')
+
+
+def transform_pool(workers=None):
+    """ process pool for the transforms, None for a single worker
+    """
+    workers = workers or TRANSFORM_WORKERS or os.cpu_count() or 1
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def get_day(day, root='dmps', pool=None):
+    """ downloads day with stream_day or run_day
+    :returns path of the json file
+    """
+    if STREAMING and OUTPUT_FORMATS == ['csv']:
+        return stream_day(day, root, pool)
+    return run_day(day, root, pool)
+
+
+def run_day(day, root='dmps', pool=None):
+    """ downloads the plans changed on day, stores them and writes the table of the day
+    :returns path of the json file
+    """
+    plans = api.retrieve_plans(day, prefetch=PREFETCH)
     pages = list(plans)
-    # create folder if it doesn't exist
-    Path('dmps').mkdir(parents=True, exist_ok=True)
-    # keep json as backup
-    with open(f'dmps/{yesterday}.json', 'w') as f:
-        f.write(json.dumps(pages))
-    # transform to table, store as csv
-    plans_df = transform(pages)
-    plans_df.to_csv(f'dmps/{yesterday}.csv', index=False)
+    # keep json as backup, in the partition of its month (dmps/year=yyyy/month=mm)
+    written = partitions.write_day(root, day, pages)
+    # add the new plan versions to the plan store and the version history
+    _store(pages, day, root, complete=True)
+    # transform to table, store as csv and/or parquet
+    plans_df = transform_parallel(pages, executor=pool)
+    if 'csv' in OUTPUT_FORMATS:
+        path = os.path.join(os.path.dirname(written), f'{day}.csv')
+        # under a temporary name until it is complete, like the json file
+        plans_df.to_csv(f'{path}.tmp', index=False)
+        os.replace(f'{path}.tmp', path)
+    if 'parquet' in OUTPUT_FORMATS:
+        parquet_output.write_day(plans_df, day, parquet_output.parquet_root(root))
+    return written
+
+
+def _stored(pages, day, root, output, pool):
+    """ passes the pages on to the json file, stores them and adds their rows to output
+    (the last page is stored with the day, once the download is complete)
+    """
+    pending = deque()
+    held = None
+    for page in pages:
+        yield page
+        if held is not None:
+            _store([held], day, root, complete=False)
+        held = page
+        if pool is None:
+            output.add(transform([page]))
+            continue
+        pending.append(pool.submit(transform, [page]))
+        while len(pending) >= PAGES_IN_TRANSFORM:
+            output.add(pending.popleft().result())
+    _store([] if held is None else [held], day, root, complete=True)
+    while pending:
+        output.add(pending.popleft().result())
+
+
+def _store(pages, day, root, complete):
+    """ adds pages of day to the plan store and the version history
+    """
+    with _store_lock:
+        plan_store.add_pages(pages, day, plan_store.store_path(root), complete)
+        plan_versions.add_pages(pages, day, plan_versions.store_path(root), complete)
+
+
+def stream_day(day, root='dmps', pool=None):
+    """ run_day a page at a time (csv output only)
+    :returns path of the json file
+    """
+    folder = partitions.partition_folder(root, day)
+    os.makedirs(folder, exist_ok=True)
+    with csv_output.PageWriter(os.path.join(folder, f'{day}.csv')) as output:
+        written = partitions.write_day(root, day, _stored(api.retrieve_plans(day, prefetch=PREFETCH),
+                                                          day, root, output, pool))
+    print(f'{day}: {output.rows} rows of {len(output.pages)} pages')
+    return written
+
+
+def day_done(day, root='dmps'):
+    """ whether day was downloaded before, with the outputs of OUTPUT_FORMATS
+    """
+    if not partitions.valid_day(root, day):
+        return False
+    if 'csv' in OUTPUT_FORMATS and not any(os.path.exists(os.path.join(folder, f'{day}.csv'))
+                                           for folder in (partitions.partition_folder(root, day), root)):
+        return False
+    parquet_path = parquet_output.day_path(day, parquet_output.parquet_root(root))
+    if 'parquet' in OUTPUT_FORMATS and not os.path.exists(parquet_path):
+        # a day without plans has no parquet file
+        path = archive.find(os.path.join(partitions.partition_folder(root, day), f'{day}.json'))
+        return path is not None and _day_entry(path).get('rows') == 0
+    return True
+
+
+def _day_entry(path):
+    """ the manifest entry of a daily file, {} if it has none
+    """
+    return partitions.load_manifest(os.path.dirname(path))['files'].get(os.path.basename(path), {})
+
+
+def backfill(start, end, root='dmps', workers=None, force=False, transform_workers=None):
+    """ downloads the days from start to end (both included) that are not there yet,
+    a number of days at the same time, with the transforms of all days in one process pool
+    :param workers: days downloaded at the same time, default BACKFILL_WORKERS
+    :param force: download the days that are already there again as well
+    :returns {'done': {day: path}, 'skipped': [days], 'failed': {day: error}}
+    """
+    first, last = date.fromisoformat(str(start)), date.fromisoformat(str(end))
+    days = [str(first + timedelta(days=n)) for n in range((last - first).days + 1)]
+    skipped = [] if force else [day for day in days if day_done(day, root)]
+    todo = [day for day in days if day not in skipped]
+    print(f'backfill {first} to {last}: {len(todo)} days to download, {len(skipped)} already there')
+    done = {}
+    failed = {}
+    started = time.perf_counter()
+    pool = transform_pool(transform_workers) if todo else None
+    try:
+        if todo:
+            with ThreadPoolExecutor(max_workers=min(workers or BACKFILL_WORKERS, len(todo))) as executor:
+                futures = {executor.submit(get_day, day, root, pool): day for day in todo}
+                for future in as_completed(futures):
+                    day = futures[future]
+                    try:
+                        done[day] = future.result()
+                    except Exception as e:
+                        failed[day] = f'{type(e).__name__}: {e}'
+                        print(f'{day} failed: {failed[day]}')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    seconds = time.perf_counter() - started
+    entries = [_day_entry(path) for path in done.values()]
+    plans = sum(entry.get('rows', 0) for entry in entries)
+    pages = sum(entry.get('pages', 0) for entry in entries)
+    size = sum(entry.get('size', 0) for entry in entries) / 1e6
+    print(f'backfill {first} to {last}: {len(done)} days downloaded, {len(skipped)} skipped, {len(failed)} failed')
+    print(f'{plans} plans in {pages} pages ({size:.1f} MB) in {seconds:.1f}s: '
+          f'{len(done) / seconds * 60 if seconds else 0:.1f} days/min, {plans / seconds if seconds else 0:.1f} plans/s')
+    for day, error in sorted(failed.items()):
+        print(f'  {day}: {error}')
+    print(f'rate limiter: {rate_limit.stats()}')
+    return {'done': done, 'skipped': skipped, 'failed': failed}
+
+
+def flatten(record):
+    """ a json object as one row, nested objects as 'key.subkey' columns, like pd.json_normalize
+    """
+    row = {key: value for key, value in record.items() if not isinstance(value, dict)}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            _flatten_into(value, f'{key}.', row)
+    return row
+
+
+def _flatten_into(record, prefix, row):
+    for key, value in record.items():
+        if isinstance(value, dict):
+            _flatten_into(value, f'{prefix}{key}.', row)
+        else:
+            row[f'{prefix}{key}'] = value
+
+
+# the question texts are the same in every plan of a template, clean them once
+_text = lru_cache(maxsize=MARKUP_CACHE_SIZE)(html_clean.html_to_text)
+
+
+def without_markup(values):
+    """ the text of html values, NaN becomes ''
+    """
+    return values.map(lambda x: '' if pd.isna(x) else _text(x))
+
+
+def _levels(pages, first=0):
+    """ the plans of pages as a table per level: metadata, sections, questions-answers
+    :returns (metadata, sections, qa, markup removed), None if there are no plans
+    """
+    plan_rows = []
+    section_rows = []
+    question_rows = []
+    # the question columns in the order the per section tables had them
+    question_columns = {}
+    # number of the plan in the download: joins the levels, also if a plan is on two pages
+    for index, plan in enumerate((plan for page in pages if page for plan in page), first):
+        plan_rows.append(dict(flatten({key: value for key, value in plan.items() if key != 'plan_content'}),
+                              _plan=index))
+        for content in plan['plan_content']:
+            for section in content['sections']:
+                # we keep the DMP id for the join, don't keep nested questions in sections table
+                section_rows.append(dict(flatten({key: value for key, value in section.items()
+                                                  if key != 'questions'}),
+                                         id=plan['id'], _plan=index))
+                rows = [dict(flatten(question), id=plan['id'], section=section['number'], _plan=index)
+                        for question in section['questions']]
+                for row in rows:
+                    question_columns.update((key, None) for key in row if key not in ('id', 'section', '_plan'))
+                if rows:
+                    question_columns.update({'id': None, 'section': None, '_plan': None})
+                question_rows.extend(rows)
+    if not plan_rows:
+        return None
+    metadata = pd.DataFrame(plan_rows)
+    sections = pd.DataFrame(section_rows, columns=None if section_rows else ['number', 'id', '_plan'])
+    qa = pd.DataFrame(question_rows, columns=list(question_columns) or ['id', 'section', '_plan'])
+    # remove markup if there's an answer
+    cleaned = 'text' in qa and 'answer.text' in qa
+    if cleaned:
+        qa['text'] = without_markup(qa['text'])
+        qa['answer.text'] = without_markup(qa['answer.text'])
+    return metadata, sections, qa, cleaned
+
+
+def _merge(metadata, sections, qa):
+    """ the levels merged into a row per question, without the test plans
+    """
+    merged = metadata.merge(sections.merge(qa,
+                                           how='left',
+                                           left_on=['number', 'id', '_plan'], right_on=['section', 'id', '_plan'],
+                                           suffixes=('_section', '_question')),
+                            how='left', on=['id', '_plan'],
+                            suffixes=('_dmp', '_section'))
+    # remove test plans
+    merged = merged[~merged['test_plan']].drop(columns='_plan')
+    # id as the page by page merges gave it: object dtype holding the int ids (not int64)
+    merged['id'] = merged['id'].astype(object)
+    return merged
 
 
 def transform(pages):
     """ transform from json to table format
     """
+    levels = _levels(pages)
+    if levels is None:
+        return pd.DataFrame()
+    metadata, sections, qa, _ = levels
+    return _merge(metadata, sections, qa)
+
+
+def _chunks(pages, workers, chunk_size=None):
+    """ :returns list of (number of the first plan, pages), about CHUNKS_PER_WORKER per worker
+    """
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(pages) // (workers * CHUNKS_PER_WORKER)))
+    chunks = []
+    first = 0
+    for start in range(0, len(pages), chunk_size):
+        chunk = pages[start:start + chunk_size]
+        chunks.append((first, chunk))
+        first += sum(len(page) for page in chunk if page)
+    return chunks
+
+
+def _chunk_levels(chunk):
+    first, pages = chunk
+    return _levels(pages, first)
+
+
+def transform_parallel(pages, workers=None, chunk_size=None, executor=None):
+    """ transform with the pages spread over a process pool, same result as transform
+    :param executor: process pool to use, default one for this call
+    """
+    pages = list(pages)
+    workers = workers or TRANSFORM_WORKERS or os.cpu_count() or 1
+    if workers < 2 or sum(len(page) for page in pages if page) < PARALLEL_MIN_PLANS:
+        return transform(pages)
+    chunks = _chunks(pages, workers, chunk_size)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            levels = [level for level in executor.map(_chunk_levels, chunks) if level is not None]
+    else:
+        levels = [level for level in executor.map(_chunk_levels, chunks) if level is not None]
+    if not levels:
+        return pd.DataFrame()
+    # leave out chunks without sections or questions, so the columns are in the order of transform
+    sections = [sections for _, sections, _, _ in levels if len(sections)] or [levels[0][1]]
+    with_questions = [(qa, cleaned) for _, _, qa, cleaned in levels if len(qa)] or [levels[0][2:]]
+    qa = pd.concat([qa for qa, _ in with_questions], ignore_index=True)
+    # markup is removed when the day has both columns, also where a chunk lacked one of them
+    if 'text' in qa and 'answer.text' in qa and not all(cleaned for _, cleaned in with_questions):
+        uncleaned = [not cleaned for part, cleaned in with_questions for _ in range(len(part))]
+        for column in ('text', 'answer.text'):
+            qa.loc[uncleaned, column] = without_markup(qa.loc[uncleaned, column])
+    return _merge(pd.concat([metadata for metadata, _, _, _ in levels], ignore_index=True),
+                  pd.concat(sections, ignore_index=True), qa)
+
+
+def transform_by_page(pages):
+    """ the former transform (with pd.concat for DataFrame.append), to compare with in benchmark
+    """
     plans = pd.DataFrame()
     for page in pages:
-        # we have three levels: metadata, sections, questions-answers
-        # split into individual tables, don't keep the columns with nested data
         metadata = pd.json_normalize(page).drop(columns='plan_content')
-        sections = pd.json_normalize(page, ['plan_content', ['sections']],
-                                     meta=['id'])  # we keep the DMP id for the join
+        sections = pd.json_normalize(page, ['plan_content', ['sections']], meta=['id'])
         qa = pd.DataFrame()
         for index, row in sections.iterrows():
             aux = pd.json_normalize(row['questions'])
-            aux[['id', 'section']] = row[['id', 'number']]  # keep for join
-            qa = qa.append(aux)
-        # remove markup if there's an answer
+            aux['id'], aux['section'] = row['id'], row['number']
+            qa = pd.concat([qa, aux])
         try:
-            qa[['text', 'answer.text']] = qa[['text', 'answer.text']].applymap(
+            qa[['text', 'answer.text']] = qa[['text', 'answer.text']].map(
                 lambda x: BeautifulSoup(x, "lxml").text if not pd.isna(x) else '')
         except KeyError:
             pass
-        # don't keep nested questions in sections table
         sections = sections.drop(columns='questions')
-        # merge tables
         merged = metadata.merge(sections.merge(qa,
                                                how='left',
                                                left_on=['number', 'id'], right_on=['section', 'id'],
                                                suffixes=('_section', '_question')),
                                 how='left', on='id',
                                 suffixes=('_dmp', '_section'))
-        # remove test plans
         merged = merged[~merged['test_plan']]
-        plans = plans.append(merged)
-
+        plans = pd.concat([plans, merged])
     return plans
 
 
+def benchmark(path, workers=None):
+    """ times the transforms on a daily json file and checks that they give the same table
+    """
+    pages = archive.load(path)
+    start = time.perf_counter()
+    by_page = transform_by_page(pages)
+    by_page_time = time.perf_counter() - start
+    start = time.perf_counter()
+    plans_df = transform(pages)
+    transform_time = time.perf_counter() - start
+    start = time.perf_counter()
+    parallel_df = transform_parallel(pages, workers)
+    parallel_time = time.perf_counter() - start
+    same = by_page.reset_index(drop=True).equals(plans_df.reset_index(drop=True))
+    same_parallel = plans_df.reset_index(drop=True).equals(parallel_df.reset_index(drop=True))
+    rows = sum(len(page) for page in pages if page)
+    print(f'{len(pages)} pages, {rows} plans, {len(plans_df)} rows: by page {by_page_time:.2f}s, '
+          f'transform {transform_time:.2f}s ({by_page_time / transform_time:.1f}x), same table: {same}')
+    print(f'transform_parallel with {workers or TRANSFORM_WORKERS or os.cpu_count()} workers '
+          f'{parallel_time:.2f}s ({transform_time / parallel_time:.1f}x), same table: {same_parallel}')
+    return by_page_time, transform_time, parallel_time
+
+
+def command_line(argv=None):
+    parser = argparse.ArgumentParser(description="download the DMPs changed on a day (default: yesterday's)")
+    commands = parser.add_subparsers(dest='command')
+    days = commands.add_parser('backfill', help='download the days of a period that are not there yet')
+    days.add_argument('start', help='first day, yyyy-mm-dd')
+    days.add_argument('end', nargs='?', help='last day, yyyy-mm-dd (default: yesterday)')
+    days.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help='days downloaded at the same time')
+    days.add_argument('--force', action='store_true', help='also download the days that are already there')
+    days.add_argument('--transform-workers', type=int, default=TRANSFORM_WORKERS,
+                      help='processes that transform the pages of all days')
+    compare = commands.add_parser('benchmark', help='compare the transforms on a daily json file')
+    compare.add_argument('path')
+    compare.add_argument('workers', type=int, nargs='?', help='processes for transform_parallel')
+    args = parser.parse_args(argv)
+
+    if args.command == 'backfill':
+        end = args.end or str((datetime.today() - timedelta(days=1)).date())
+        result = backfill(args.start, end, workers=args.workers, force=args.force,
+                          transform_workers=args.transform_workers)
+        if result['failed']:
+            sys.exit(1)
+    elif args.command == 'benchmark':
+        benchmark(args.path, args.workers)
+    else:
+        main()
+
+
 if __name__ == "__main__":
-    main()
+    # python day_job.py: yesterday's plans (the daily scheduled run)
+    # python day_job.py backfill 2024-01-01 2024-01-31: the days of january that are missing
+    # python day_job.py benchmark dmps/year=2024/month=01/2024-01-02.json.zst [workers]: compare the transforms
+    command_line()
@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+
+import archive
+import file_scan
+import header_parser
+import json_codec
+import partitions
+
+CATALOG_FILE = 'catalog.json'
+# kept in every partition (and in the folder itself for daily files from before the partitions)
+HEADER_FIELDS = ['id', 'title', 'template', 'funder', 'last_updated', 'creation_date']
+HEADER_COLUMNS = HEADER_FIELDS + ['file_name']
+
+
+def header_rows(plans):
+    """ the header fields of each plan
+    """
+    return [[str(plan['id']), plan['title'], plan['template']['title'], plan['funder']['name'],
+             plan['last_updated'], plan['creation_date']]
+            for plan in plans]
+
+
+def read_header_rows(path):
+    """ header rows of a daily file, only the header fields are parsed (plan_content is skipped)
+    :returns (rows, size of the json in bytes, before compression)
+    """
+    with archive.open_plain(path) as f:
+        return header_rows(header_parser.iter_file_headers(f)), os.fstat(f.fileno()).st_size
+
+
+def load_catalog(folder):
+    path = os.path.join(folder, CATALOG_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        return json_codec.load_file(path)
+    except ValueError:
+        print('catalog unreadable, rebuilding it')
+        return {}
+
+
+def save_catalog(folder, catalog):
+    json_codec.dump_file(catalog, os.path.join(folder, CATALOG_FILE))
+
+
+def update(folder, skip_days=()):
+    """ brings the catalog of folder up to date: files that are new or whose
+    size or modification time changed are read, the others are taken from the catalog
+    :param skip_days: days whose files are not read (their plans come from elsewhere)
+    :returns catalog {file name: {'mtime': ..., 'size': ..., 'json_size': ..., 'rows': [...]}}
+    """
+    catalog = load_catalog(folder)
+    current = {}
+    changed = 0
+    for file in file_scan.scan(folder, pattern=partitions.DAILY_FILE):
+        known = catalog.get(file.name)
+        if known and known['mtime'] == file.mtime and known['size'] == file.size:
+            current[file.name] = known
+            continue
+        if partitions.DAILY_FILE.match(file.name).group(1) in skip_days:
+            continue
+        print(f'Reading headers from {file.name}')
+        rows, json_size = read_header_rows(file.path)
+        current[file.name] = {'mtime': file.mtime, 'size': file.size, 'json_size': json_size, 'rows': rows}
+        changed += 1
+    if changed or current.keys() != catalog.keys():
+        save_catalog(folder, current)
+    if changed:
+        print(f'Catalog of {folder}: {len(current)} files, {changed} read again')
+    return current
+
+
+def headers(folder, year=None, min_size=1025, skip_days=()):
+    """ header fields of all plans in the daily files, as Steps 1-2 of the stats scripts use them
+    :param folder: root of the daily json files (the year=/month= partitions, and
+    older files that are still in the folder itself)
+    :param year: only files of that year, only the partitions of that year are opened
+    :param min_size: skip files of this size or smaller (empty downloads), the size of
+    the json before compression so compressed files are skipped the same way
+    :param skip_days: leave out the files of these days (e.g. the days of the plan store)
+    :returns DataFrame with HEADER_COLUMNS, ordered by file name
+    """
+    files = []
+    for part in [folder] + partitions.folders(folder, year, year):
+        for name, entry in update(part, skip_days).items():
+            if (year is None or name[0:4] == str(year)) and entry.get('json_size', entry['size']) > min_size \
+                    and partitions.DAILY_FILE.match(name).group(1) not in skip_days:
+                files.append((name, entry))
+    rows = []
+    for name, entry in sorted(files, key=lambda file: file[0]):
+        rows.extend(row + [archive.logical_name(name)] for row in entry['rows'])
+    return pd.DataFrame(rows, columns=HEADER_COLUMNS)
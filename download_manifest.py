@@ -0,0 +1,46 @@
+import os
+
+import archive
+import json_codec
+
+
+def load_manifest(path):
+    """ reads the download manifest: {file: {'id': ..., 'last_updated': ...}}, an entry per file,
+    as a plan can be downloaded to more than one file
+    returns an empty manifest if there is none yet
+    """
+    if not os.path.exists(path):
+        return {}
+    return json_codec.load_file(path)
+
+
+def save_manifest(manifest, path):
+    """ writes the manifest through a temporary file, so an interrupted run
+    never leaves a half written manifest behind
+    """
+    json_codec.dump_file(manifest, path, indent=2)
+
+
+def is_current(manifest, identifier, last_updated, file):
+    """ True if the plan was downloaded to file (plain or compressed) before and hasn't changed since
+    """
+    entry = manifest.get(file)
+    return (entry is not None
+            and entry.get('id') == str(identifier)
+            and entry.get('last_updated') == last_updated
+            and archive.find(file) is not None)
+
+
+def record(manifest, identifier, last_updated, file):
+    manifest[file] = {'id': str(identifier), 'last_updated': last_updated}
+
+
+def remove(manifest, file):
+    """ drops the entry of file and the file itself (plain or compressed)
+    :returns path of the removed file, None if there was none
+    """
+    manifest.pop(file, None)
+    path = archive.find(file)
+    if path is not None:
+        os.remove(path)
+    return path
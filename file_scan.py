@@ -0,0 +1,117 @@
+import os
+import threading
+from datetime import date, datetime
+from typing import NamedTuple
+
+import pandas as pd
+
+import archive
+
+# columns of the file tables the scripts loop over (File_name without compression suffix)
+LISTING_COLUMNS = ['File_name', 'File_size', 'Path']
+
+
+class FileInfo(NamedTuple):
+    """ one file of a scan, size and mtime come from the directory listing itself
+    """
+    name: str
+    path: str
+    size: int
+    mtime: float
+
+    @property
+    def logical_name(self):
+        return archive.logical_name(self.name)
+
+
+# folder -> (mtime of the folder, all files in it), see cached_scan
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def timestamp(moment):
+    """ :param moment: datetime, date, yyyy-mm-dd or seconds since the epoch, None stays None
+    """
+    if moment is None or isinstance(moment, (int, float)):
+        return moment
+    if isinstance(moment, str):
+        moment = datetime.fromisoformat(moment)
+    elif not isinstance(moment, datetime) and isinstance(moment, date):
+        moment = datetime(moment.year, moment.month, moment.day)
+    return moment.timestamp()
+
+
+def _files(folder):
+    """ all files in folder (not the subfolders), one scandir pass: on Windows (and so on the
+    network share) the size and mtime come with the directory entries, no stat per file
+    """
+    files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file():
+                stat = entry.stat()
+                files.append(FileInfo(entry.name, entry.path, stat.st_size, stat.st_mtime))
+    return files
+
+
+def folders(folder, pattern=None):
+    """ the subfolders of folder, in one scandir pass like the files
+    :param pattern: compiled regular expression the name has to match
+    :returns list of (name, path), ordered by name
+    """
+    with os.scandir(folder) as entries:
+        found = [(entry.name, entry.path) for entry in entries
+                 if entry.is_dir() and (pattern is None or pattern.match(entry.name))]
+    return sorted(found)
+
+
+def _select(files, suffixes, pattern, min_size, max_size, since, until):
+    if isinstance(suffixes, str):
+        suffixes = (suffixes,)
+    since, until = timestamp(since), timestamp(until)
+    selected = [
+        file for file in files
+        if (suffixes is None or file.logical_name.endswith(tuple(suffixes)))
+        and (pattern is None or pattern.match(file.name))
+        and (min_size is None or file.size > min_size)
+        and (max_size is None or file.size <= max_size)
+        and (since is None or file.mtime >= since)
+        and (until is None or file.mtime < until)
+    ]
+    return sorted(selected, key=lambda file: file.name)
+
+
+def scan(folder, suffixes=None, pattern=None, min_size=None, max_size=None, since=None, until=None):
+    """ the files in folder that pass all the filters given
+    :param suffixes: extension(s) of the name without compression suffix, e.g. '.json' also gives 123.json.zst
+    :param pattern: compiled regular expression the name has to match
+    :param min_size: only files larger than this (bytes on disk)
+    :param max_size: only files of at most this size
+    :param since: only files modified at or after this moment (see timestamp)
+    :param until: only files modified before this moment
+    :returns list of FileInfo, ordered by name
+    """
+    return _select(_files(folder), suffixes, pattern, min_size, max_size, since, until)
+
+
+def cached_scan(folder, suffixes=None, pattern=None, min_size=None, max_size=None, since=None, until=None):
+    """ scan that lists folder only once per run: later calls take the files from memory
+    as long as the modification time of the folder (which changes when files are added,
+    removed or renamed in it) is the same.
+    """
+    key = os.path.abspath(folder)
+    mtime = os.stat(folder).st_mtime
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, _files(folder))
+        with _cache_lock:
+            _cache[key] = cached
+    return _select(cached[1], suffixes, pattern, min_size, max_size, since, until)
+
+
+def listing(files):
+    """ the files of a scan as the table the scripts loop over
+    :returns DataFrame with LISTING_COLUMNS
+    """
+    return pd.DataFrame([(file.logical_name, file.size, file.path) for file in files], columns=LISTING_COLUMNS)
@@ -0,0 +1,145 @@
+import mmap
+import re
+
+import json_codec
+
+# plan fields the scripts use to list plans, everything else (plan_content with all
+# sections, questions and answers) is skipped without being turned into python objects
+HEADER_KEYS = {'id', 'title', 'template', 'funder', 'last_updated', 'creation_date'}
+
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|-?[0-9][0-9.eE+-]*|true|false|null')
+# bytes that matter when skipping a nested value: brackets and the start of a string
+_SPECIAL = re.compile(rb'[\[\]{}"]')
+
+
+class HeaderParser:
+    """ walks a daily download ([[plan, ...], ...]) on the raw bytes and only decodes
+    the header fields of each plan
+    """
+
+    def __init__(self, buf, keys=HEADER_KEYS):
+        self.buf = buf
+        self.pos = 0
+        self.keys = {key.encode('utf-8'): key for key in keys}
+
+    def skip_whitespace(self):
+        self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+
+    def peek(self):
+        self.skip_whitespace()
+        return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'expected {char!r} at byte {self.pos}, found {self.peek()!r}')
+        self.pos += 1
+
+    def value_end(self):
+        """ position just after the value that starts at pos
+        """
+        char = self.peek()
+        if char in (b'{', b'['):
+            buf = self.buf
+            pos = self.pos
+            depth = 0
+            while True:
+                match = _SPECIAL.search(buf, pos)
+                if match is None:
+                    raise ValueError('unexpected end of file')
+                pos = match.end()
+                char = buf[pos - 1]
+                if char == 0x22:  # "
+                    pos = self.string_end(pos)
+                elif char in (0x5b, 0x7b):  # [ {
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        return pos
+        match = _SCALAR.match(self.buf, self.pos)
+        if not match:
+            raise ValueError(f'unexpected value at byte {self.pos}')
+        return match.end()
+
+    def string_end(self, pos):
+        """ position just after the closing quote of the string whose content starts at pos
+        jumps from quote to quote, so long answers cost (almost) nothing
+        """
+        buf = self.buf
+        while True:
+            quote = buf.find(b'"', pos)
+            if quote < 0:
+                raise ValueError('unexpected end of file')
+            backslash = quote - 1
+            while buf[backslash] == 0x5c:  # \
+                backslash -= 1
+            pos = quote + 1
+            if (quote - 1 - backslash) % 2 == 0:  # quote is not escaped
+                return pos
+
+    def items(self):
+        """ yields the elements of the list at pos, leaves pos at each element
+        """
+        self.expect(b'[')
+        if self.peek() == b']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == b']':
+                return
+            if char != b',':
+                raise ValueError(f'expected , or ] at byte {self.pos - 1}')
+
+    def plan(self):
+        """ the header fields of the plan object at pos
+        """
+        header = {}
+        self.expect(b'{')
+        if self.peek() == b'}':
+            self.pos += 1
+            return header
+        while True:
+            self.skip_whitespace()
+            match = _STRING.match(self.buf, self.pos)
+            if not match:
+                raise ValueError(f'expected a key at byte {self.pos}')
+            key = self.keys.get(match.group()[1:-1])
+            self.pos = match.end()
+            self.expect(b':')
+            end = self.value_end()
+            if key is not None:
+                header[key] = json_codec.loads(self.buf[self.pos:end])
+            self.pos = end
+            char = self.peek()
+            self.pos += 1
+            if char == b'}':
+                return header
+            if char != b',':
+                raise ValueError(f'expected , or }} at byte {self.pos - 1}')
+
+    def plans(self):
+        for _ in self.items():
+            if self.peek() == b'n':  # null page
+                self.pos = self.value_end()
+                continue
+            for _ in self.items():
+                yield self.plan()
+
+
+def iter_file_headers(f):
+    """ header fields (HEADER_KEYS) of every plan in the open (binary, plain json) file f
+    the file is memory mapped, so memory use doesn't depend on the size of the answers
+    :returns generator of dicts
+    """
+    try:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty file
+        return
+    with buf:
+        yield from HeaderParser(buf).plans()
+
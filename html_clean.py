@@ -0,0 +1,235 @@
+import os
+import re
+import sys
+import time
+from html.entities import name2codepoint
+
+from bs4 import BeautifulSoup
+
+# The two ways the answers are cleaned of html:
+# - clean_answer: remove_html of the stats scripts as one regular expression pass, followed
+#   by joining the lines with _-_ and replacing tags_sp/tags_nv
+# - html_to_text: BeautifulSoup(text, "lxml").text as day_job uses it, without building a
+#   tree for the plain answers the editor writes (everything else still goes to BeautifulSoup)
+# Both give exactly the same text as the code they replace.
+
+# remove_html: a tag runs from < to the next > that is not between quotes (either quote
+# character opens and closes), an unclosed tag runs to the end, a > outside a tag is dropped
+_REMOVE_HTML = re.compile(r'''<(?:[^'">]+|['"][^'"]*(?:['"]|$))*(?:>|$)|>''')
+
+# whitespace as BeautifulSoup sees it: a string of only these becomes a single space or newline
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+# tags the editor writes, the parser keeps the whitespace between them
+TEXT_TAGS = {'p', 'div', 'span', 'strong', 'b', 'em', 'i', 'u', 's', 'strike', 'a', 'ul', 'ol', 'li',
+             'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'code', 'font', 'small', 'big',
+             'del', 'ins', 'abbr', 'cite', 'q'}
+EMPTY_TAGS = {'br'}
+# block tags are only left where they are inside the container tags, inside anything
+# else (like a p or a strong) the parser closes or moves tags
+BLOCK_TAGS = {'p', 'div', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote'}
+CONTAINER_TAGS = {'div', 'ul', 'ol', 'li', 'blockquote'}
+_SIMPLE_TAG = re.compile(r'''<(/?)([a-zA-Z][a-zA-Z0-9]*)(?:\s+[^\s"'<>/=]+(?:\s*=\s*(?:"[^"<>]*"|'[^'<>]*'|[^\s"'<>=`/]+))?)*\s*(/?)>''')
+# control characters libxml2 changes or complains about, and markup the fast path doesn't handle
+_NOT_SIMPLE = re.compile(r'[\x00-\x08\x0b-\x1f\x7f]|<!|<\?')
+_ENTITY = re.compile(r'&(?:([a-zA-Z][a-zA-Z0-9]*);)?')
+
+
+class NotSimple(Exception):
+    """ html the fast path of html_to_text leaves to BeautifulSoup
+    """
+
+
+def remove_html(text):
+    """ remove_html of the stats scripts: strips the tags (and any >) from text.
+    Like the original it fails on text that doesn't start with < or >, which the
+    scripts turn into 'Unknown' (the original raised UnboundLocalError, this ValueError)
+    """
+    if text and text[0] not in '<>':
+        raise ValueError('text does not start with a tag')
+    return _REMOVE_HTML.sub('', text)
+
+
+def clean_answer(text, tags_sp, tags_nv, nv_replacement):
+    """ an answer as the stats scripts put it in the overview: remove_html, the lines
+    stripped and joined with _-_, tags_sp replaced with a space and tags_nv with nv_replacement
+    (in that order, str.replace is as fast as one regular expression for all of them)
+    :raises ValueError: like remove_html
+    """
+    answer = '_-_'.join(line.strip() for line in remove_html(text).splitlines())
+    for tag in tags_sp:
+        answer = answer.replace(tag, ' ')
+    for tag in tags_nv:
+        answer = answer.replace(tag, nv_replacement)
+    return answer
+
+
+def _entity(match):
+    name = match.group(1)
+    if name is None:
+        # a single & followed by a space is text, anything else is left to the parser
+        if match.string[match.end():match.end() + 1] not in (' ', '\t', '\n') or match.end() == len(match.string):
+            raise NotSimple()
+        return '&'
+    if name not in name2codepoint:
+        raise NotSimple()
+    return chr(name2codepoint[name])
+
+
+def _simple_text(markup):
+    """ the text of markup that only has TEXT_TAGS and EMPTY_TAGS, known entities and no
+    comments, without a parser: what libxml2 and BeautifulSoup make of it, whitespace included
+    :raises NotSimple: for anything else
+    """
+    if markup[0] in ASCII_SPACES or _NOT_SIMPLE.search(markup):
+        raise NotSimple()
+    parts = _SIMPLE_TAG.split(markup)
+    output = []
+    open_tags = []
+    for index in range(0, len(parts), 4):
+        text = parts[index]
+        if text:
+            if '<' in text:
+                raise NotSimple()
+            if '&' in text:
+                text = _ENTITY.sub(_entity, text)
+            if not text.strip(ASCII_SPACES):
+                text = '\n' if '\n' in text else ' '
+            output.append(text)
+        if index + 1 < len(parts):
+            closing, name, self_closing = parts[index + 1], parts[index + 2].lower(), parts[index + 3]
+            if name in EMPTY_TAGS and not closing:
+                continue
+            if name not in TEXT_TAGS or self_closing:
+                raise NotSimple()
+            if closing:
+                if not open_tags or open_tags.pop() != name:
+                    raise NotSimple()
+                continue
+            # the tags the parser would close or move: leave it to the parser
+            if name in BLOCK_TAGS and not CONTAINER_TAGS.issuperset(open_tags):
+                raise NotSimple()
+            if name == 'li':
+                in_list = max((position for position, tag in enumerate(open_tags) if tag in ('ul', 'ol')), default=-1)
+                if 'li' in open_tags[in_list + 1:]:
+                    raise NotSimple()
+            if name in open_tags and name in ('a', 'p'):
+                raise NotSimple()
+            open_tags.append(name)
+    return ''.join(output)
+
+
+def html_to_text(markup):
+    """ BeautifulSoup(markup, "lxml").text, plain answers (paragraphs, lists, emphasis,
+    line breaks) are done with regular expressions instead of a parser
+    """
+    if not markup:
+        return BeautifulSoup(markup, "lxml").text
+    try:
+        return _simple_text(markup)
+    except NotSimple:
+        return BeautifulSoup(markup, "lxml").text
+
+
+def _remove_html_by_character(text):
+    """ remove_html as the stats scripts had it, for the benchmark
+    """
+    tags = False
+    quote = False
+    output = ""
+
+    for ch in text:
+        if ch == '<' and not quote:
+            tag = True
+        elif ch == '>' and not quote:
+            tag = False
+        elif (ch == '"' or ch == "'") and tag:
+            quote = not quote
+        elif not tag:
+            output = output + ch
+    return output
+
+
+def _clean_answer_by_loops(text, tags_sp, tags_nv, nv_replacement):
+    """ the cleaning of an answer as the stats scripts had it, for the benchmark
+    """
+    answer = "_-_".join(line.strip() for line in _remove_html_by_character(text).splitlines())
+    for tag in tags_sp:
+        if tag in answer:
+            answer = answer.replace(tag, ' ')
+    for tag in tags_nv:
+        if tag in answer:
+            answer = answer.replace(tag, nv_replacement)
+    return answer
+
+
+def _outcome(function, text):
+    """ the result of function or, as the scripts have it, 'Unknown' when it fails
+    """
+    try:
+        return function(text)
+    except Exception:
+        return 'Unknown'
+
+
+def answer_texts(paths):
+    """ the question and answer texts of the plans in daily json files (plain or compressed)
+    :param paths: json files and/or folders with daily json files (as partitions)
+    """
+    import archive  # only needed for the benchmark
+    import partitions
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(file for _, file in partitions.daily_files(path))
+        else:
+            files.append(path)
+    texts = []
+    for file in files:
+        for page in archive.iter_pages(file):
+            for plan in page or []:
+                for content in plan['plan_content']:
+                    for section in content['sections']:
+                        for question in section['questions']:
+                            texts.append(question['text'])
+                            if question.get('answer', {}).get('text') is not None:
+                                texts.append(question['answer']['text'])
+    return texts
+
+
+def benchmark(texts, repeat=3):
+    """ times the cleaners against the code they replace on the given html texts
+    and counts the texts where they give something else (which should be none)
+    :returns {name: (seconds before, seconds now, number of differences)}
+    """
+    tags_sp, tags_nv = ['&ndash', '&nbsp', '&amp;', '&amp'], [';']
+    cases = {
+        'html_to_text': (lambda text: BeautifulSoup(text, "lxml").text, html_to_text),
+        'clean_answer': (lambda text: _clean_answer_by_loops(text, tags_sp, tags_nv, '.'),
+                         lambda text: clean_answer(text, tags_sp, tags_nv, '.')),
+    }
+    print(f'{len(texts)} texts, {sum(len(text) for text in texts) / 1e6:.1f} million characters')
+    results = {}
+    for name, functions in cases.items():
+        times = []
+        outputs = []
+        for function in functions:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output = [_outcome(function, text) for text in texts]
+                best = min(best, time.perf_counter() - start)
+            times.append(best)
+            outputs.append(output)
+        differences = sum(before != now for before, now in zip(*outputs))
+        results[name] = (times[0], times[1], differences)
+        print(f'{name:13} before {times[0]:6.2f}s  now {times[1]:6.2f}s  ({times[0] / times[1]:5.1f}x)  '
+              f'{differences} texts differ')
+    return results
+
+
+if __name__ == "__main__":
+    # python html_clean.py dmps: compare with the former cleaning on the answers in the daily files
+    if len(sys.argv) > 1:
+        benchmark(answer_texts(sys.argv[1:]))
+    else:
+        print('usage: python html_clean.py <json files or folders with daily json files>')
@@ -0,0 +1,207 @@
+import io
+import json
+import os
+import sys
+import time
+
+try:
+    import orjson
+except ImportError:  # the faster backends are optional, the standard library always works
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+import archive
+import config
+import partitions
+
+# backends in order of preference, the first one that is installed is used
+# unless JSON_BACKEND in config.py names another one
+BACKENDS = ['orjson', 'msgspec', 'json']
+
+
+class Codec:
+    """ one json backend: loads takes bytes or str, dumpb gives utf-8 bytes.
+    Whatever the backend, invalid json raises ValueError.
+    """
+
+    def __init__(self, name, loads, dumpb):
+        self.name = name
+        self.loads = loads
+        self.dumpb = dumpb
+
+
+def _json_loads(data):
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def _json_dumpb(obj, indent=None):
+    return json.dumps(obj, indent=indent, ensure_ascii=False).encode('utf-8')
+
+
+def _orjson_dumpb(obj, indent=None):
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, option=option)
+
+
+def _msgspec_loads(data):
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+def _msgspec_dumpb(obj, indent=None):
+    data = msgspec.json.encode(obj)
+    return msgspec.json.format(data, indent=indent) if indent else data
+
+
+def available():
+    """ the backends that are installed, in order of preference
+    """
+    installed = {'orjson': orjson, 'msgspec': msgspec, 'json': json}
+    return [name for name in BACKENDS if installed[name] is not None]
+
+
+def codec(name):
+    if name not in available():
+        raise ImportError(f'json backend {name} is not installed (pip install {name})')
+    if name == 'orjson':
+        return Codec(name, orjson.loads, _orjson_dumpb)
+    if name == 'msgspec':
+        return Codec(name, _msgspec_loads, _msgspec_dumpb)
+    return Codec(name, _json_loads, _json_dumpb)
+
+
+# the faster backends can't decode a value that is followed by more text
+_decoder = json.JSONDecoder()
+
+BACKEND = getattr(config, 'JSON_BACKEND', None) or available()[0]
+_codec = codec(BACKEND)
+
+
+def use(name):
+    """ switches to another backend, e.g. for the benchmark
+    """
+    global BACKEND, _codec
+    _codec = codec(name)
+    BACKEND = name
+
+
+def loads(data):
+    """ :param data: json as bytes (preferred, it needn't be decoded first) or str
+    """
+    return _codec.loads(data)
+
+
+def raw_decode(text, pos=0):
+    """ decodes the json value that starts at pos of text (str) and ignores what follows,
+    always with the standard library
+    :returns (value, position after the value)
+    """
+    return _decoder.raw_decode(text, pos)
+
+
+def dumpb(obj, indent=None):
+    """ :returns obj as json in utf-8 bytes (non-ascii characters are not escaped)
+    """
+    return _codec.dumpb(obj, indent)
+
+
+def dumps(obj, indent=None):
+    return dumpb(obj, indent).decode('utf-8')
+
+
+def load(f):
+    """ reads a json file that is open in binary (preferred) or text mode
+    """
+    return loads(f.read())
+
+
+def dump(obj, f, indent=None):
+    """ writes obj to a file that is open in binary (preferred) or text mode
+    """
+    if isinstance(f, io.TextIOBase):
+        f.write(dumps(obj, indent))
+    else:
+        f.write(dumpb(obj, indent))
+
+
+def load_file(path):
+    with open(path, 'rb') as f:
+        return load(f)
+
+
+def dump_file(obj, path, indent=None):
+    """ writes obj to path through a temporary file, so an interrupted
+    run never leaves a half written file behind
+    """
+    tmp = f'{path}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            dump(obj, f, indent)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def read_bytes(path):
+    """ the bytes of a json file, plain or compressed
+    """
+    with archive.open_binary(path) as stream:
+        return stream.read()
+
+
+def benchmark(paths, repeat=3):
+    """ times loads and dumpb of every installed backend on the given json files
+    (plain or compressed, the decompression is not timed)
+    :param paths: json files and/or folders with daily json files (as partitions)
+    :returns {backend: (load seconds, dump seconds)}, best of repeat runs
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(read_bytes(file) for _, file in partitions.daily_files(path))
+        else:
+            files.append(read_bytes(path))
+    size = sum(len(data) for data in files) / 1e6
+    print(f'{len(files)} files, {size:.1f} MB of json')
+    current = BACKEND
+    results = {}
+    try:
+        for name in available():
+            use(name)
+            objects = [loads(data) for data in files]
+            load_time = dump_time = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for data in files:
+                    loads(data)
+                load_time = min(load_time, time.perf_counter() - start)
+                start = time.perf_counter()
+                for obj in objects:
+                    dumpb(obj)
+                dump_time = min(dump_time, time.perf_counter() - start)
+            results[name] = (load_time, dump_time)
+    finally:
+        use(current)
+    base_load, base_dump = results['json']
+    for name, (load_time, dump_time) in results.items():
+        print(f'{name:8} load {load_time:6.3f}s ({size / load_time:6.1f} MB/s, {base_load / load_time:4.1f}x)  '
+              f'dump {dump_time:6.3f}s ({size / dump_time:6.1f} MB/s, {base_dump / dump_time:4.1f}x)')
+    return results
+
+
+if __name__ == "__main__":
+    # python json_codec.py dmps: compare the backends on the real plan files
+    if len(sys.argv) > 1:
+        benchmark(sys.argv[1:])
+    else:
+        print('usage: python json_codec.py <json files or folders (plain or compressed)>')
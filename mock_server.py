@@ -0,0 +1,217 @@
+# Local stand-in for the DMP Online api, for testing and benchmarking without dmponline.vu.nl
+# It serves /api/v0/plans, /api/v1/authenticate and /api/v1/plans/{id} from recorded json
+# files (as written by day_job) or from synthetic plans, with optional latency, errors and
+# throttling. Point the api programs at it with DMP_ONLINE_HOST in config.py:
+#
+#   python mock_server.py --plans 3000 --per-page 10 --latency 0.05 --error-rate 0.01
+#   DMP_ONLINE_HOST = 'http://localhost:8000'
+
+import argparse
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import archive
+import json_codec
+import partitions
+
+TEMPLATES = [
+    '1 - VU DMP template 2021 (NWO & ZonMW certified) v1.4',
+    '2 - VU GDPR registration form for research 2021 v1.1',
+    'Horizon Europe DMP template',
+]
+FUNDERS = ['NWO', 'ZonMW', 'European Commission', '']
+TOKEN = 'mock-token'
+PLAN_URL = 'https://dmponline.vu.nl/api/v1/plans/'
+
+
+def synthetic_plan(id, rnd):
+    """ a plan with the fields the scripts use, answers in html like the real thing
+    """
+    created = date(2021, 1, 1) + timedelta(days=rnd.randrange(1000))
+    updated = created + timedelta(days=rnd.randrange(400))
+    sections = []
+    for s in range(1, rnd.randint(3, 8)):
+        questions = []
+        for q in range(1, rnd.randint(4, 12)):
+            question = {'number': q, 'text': f'<p>Question {s}.{q} about <strong>data</strong>?</p>'}
+            if rnd.random() < 0.8:
+                words = ' '.join(rnd.choice(['data', 'research', 'storage', 'privacy', 'consent',
+                                             'archive', 'SURFdrive', 'Yoda', '&amp;', '&nbsp;'])
+                                 for _ in range(rnd.randint(5, 200)))
+                question['answer'] = {'text': f'<p>{words}</p>\n<p>More text.</p>',
+                                      'options': [{'text': 'Yes'}]}
+            questions.append(question)
+        sections.append({'number': s, 'title': f'Section {s}', 'questions': questions})
+    return {
+        'id': id,
+        'title': f'Plan {id}',
+        'test_plan': rnd.random() < 0.05,
+        'template': {'id': 1, 'title': rnd.choice(TEMPLATES)},
+        'funder': {'name': rnd.choice(FUNDERS)},
+        'data_contact': {'name': f'Researcher {id}', 'email': f'r{id}@vu.nl'},
+        'creation_date': f'{created}T10:00:00Z',
+        'last_updated': f'{updated}T12:00:00Z',
+        'plan_content': [{'sections': sections}],
+    }
+
+
+def load_fixtures(folder):
+    """ plans from recorded daily json files (in the partitions of folder, plain or compressed),
+    newest version wins
+    """
+    plans = {}
+    for _, file in partitions.daily_files(folder):
+        for page in archive.iter_pages(file):
+            for plan in page or []:
+                plans[plan['id']] = plan
+    return plans
+
+
+def v1_item(plan):
+    """ the api v1 (RDA common standard) view of a plan, as used in Step 9
+    """
+    return {'dmp': {
+        'title': plan['title'],
+        'dmp_id': {'identifier': f'{PLAN_URL}{plan["id"]}', 'type': 'url'},
+        'created': plan['creation_date'],
+        'modified': plan['last_updated'],
+        'project': [{'title': plan['title'], 'start': '2022-01-01T00:00:00Z',
+                     'end': '2026-12-31T00:00:00Z'}],
+    }}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real server
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self.simulate():
+            return
+        if url.path == '/api/v0/plans':
+            if self.headers.get('Authorization') != f'Token token={self.server.secret}':
+                return self.reply(401, {'error': 'invalid token'})
+            params = parse_qs(url.query)
+            page = int(params.get('page', ['1'])[0])
+            plans = self.server.select(params.get('plan', [None])[0])
+            size = self.server.per_page
+            return self.reply(200, plans[(page - 1) * size:page * size])
+        match = re.fullmatch(r'/api/v1/plans/(\d+)', url.path)
+        if match:
+            if self.headers.get('Authorization') != f'Bearer {TOKEN}':
+                return self.reply(401, {'error': 'invalid token'})
+            plan = self.server.plans.get(int(match.group(1)))
+            if plan is None:
+                return self.reply(404, {'items': [], 'errors': ['not found']})
+            return self.reply(200, {'items': [v1_item(plan)]})
+        self.reply(404, {'error': 'unknown endpoint'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if not self.simulate():
+            return
+        if urlparse(self.path).path == '/api/v1/authenticate':
+            return self.reply(200, {'access_token': TOKEN, 'token_type': 'Bearer',
+                                    'expires_in': self.server.token_lifetime,
+                                    'created_at': int(time.time())})
+        self.reply(404, {'error': 'unknown endpoint'})
+
+    def simulate(self):
+        """ add latency and injected failures, returns False if the request failed
+        """
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+        if random.random() < server.throttle_rate:
+            self.reply(429, {'error': 'too many requests'}, {'Retry-After': '1'})
+            return False
+        if random.random() < server.error_rate:
+            self.reply(random.choice([500, 502, 503]), {'error': 'injected error'})
+            return False
+        return True
+
+    def reply(self, status, body, headers=None):
+        data = json_codec.dumpb(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.lock:
+            self.server.counts[status] = self.server.counts.get(status, 0) + 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, plans, secret='', per_page=10, latency=0.0, error_rate=0.0,
+                 throttle_rate=0.0, token_lifetime=7200, verbose=False):
+        super().__init__(address, MockHandler)
+        self.plans = plans
+        self.ordered = sorted(plans.values(), key=lambda p: p['id'])
+        self.secret = secret
+        self.per_page = per_page
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.token_lifetime = token_lifetime
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def select(self, plan=None):
+        """ the v0 'plan' parameter is either a plan id or a date (day_job)
+        """
+        if not plan:
+            return self.ordered
+        if plan.isdigit():
+            return [p for p in self.ordered if p['id'] == int(plan)]
+        return [p for p in self.ordered if p['last_updated'].startswith(plan)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='local mock of the DMP Online api')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fixtures', help='folder with recorded json files (default: synthetic plans)')
+    parser.add_argument('--plans', type=int, default=1000, help='number of synthetic plans')
+    parser.add_argument('--per-page', type=int, default=10, help='plans per v0 page')
+    parser.add_argument('--latency', type=float, default=0.0, help='average seconds per request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 5xx')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--secret', default='', help='CLIENT_SECRET the v0 api accepts')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.fixtures:
+        plans = load_fixtures(args.fixtures)
+    else:
+        rnd = random.Random(args.seed)
+        plans = {id: synthetic_plan(id, rnd) for id in range(100001, 100001 + args.plans)}
+    server = MockServer(('localhost', args.port), plans, secret=args.secret, per_page=args.per_page,
+                        latency=args.latency, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate, verbose=args.verbose)
+    pages = -(-len(plans) // args.per_page)
+    print(f'serving {len(plans)} plans ({pages} pages) on http://localhost:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f'responses: {server.counts}')
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # parquet output is optional, csv works without it
+    pa = None
+
+# repeated text that is stored once per file (dictionary encoded), the
+# long free-text answers are stored as plain strings. The list is fixed so
+# every daily file gets the same types and the partitions can be read together.
+DICTIONARY_COLUMNS = ['template.title', 'funder.name', 'org.name', 'title_dmp', 'title_section',
+                      'text', 'data_contact.name', 'data_contact.email']
+DATE_COLUMNS = ['creation_date', 'last_updated']
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError('parquet output needs pyarrow (pip install pyarrow)')
+
+
+def to_table(plans_df):
+    """ arrow table with explicit types for the flattened plans of one day
+    """
+    require_pyarrow()
+    df = plans_df.copy()
+    for column in DATE_COLUMNS:
+        if column in df:
+            df[column] = pd.to_datetime(df[column], utc=True, errors='coerce')
+    fields = []
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.kind in 'biufM':
+            type = pa.Schema.from_pandas(df[[column]], preserve_index=False).field(column).type
+        else:
+            non_null = values.dropna()
+            if len(non_null) and not non_null.map(lambda x: isinstance(x, str)).all():
+                values = values.map(lambda x: x if pd.isna(x) else str(x))
+                df[column] = values
+            type = pa.string()
+            if column in DICTIONARY_COLUMNS:
+                type = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(column, type))
+    return pa.Table.from_pandas(df, schema=pa.schema(fields), preserve_index=False)
+
+
+def parquet_root(root='dmps'):
+    """ the parquet folder of the json partitions in root: dmps -> dmps_parquet
+    """
+    return f'{os.path.normpath(root)}_parquet'
+
+
+def day_path(day, root='dmps_parquet'):
+    """ root/year=yyyy/month=mm/yyyy-mm-dd.parquet, the file of day
+    """
+    return f'{root}/year={day[0:4]}/month={day[5:7]}/{day}.parquet'
+
+
+def write_day(plans_df, day, root='dmps_parquet'):
+    """ writes the table of one day to root/year=yyyy/month=mm/yyyy-mm-dd.parquet
+    :returns path of the written file, None for a day without rows (nothing is written)
+    """
+    if not len(plans_df):
+        # no columns to give it a schema, read() gives the same without a file
+        return None
+    table = to_table(plans_df)
+    path = day_path(day, root)
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    # hidden temporary name, readers of the partitions skip it
+    tmp = f'{folder}/.{day}.parquet.tmp'
+    pq.write_table(table, tmp, compression='zstd')
+    os.replace(tmp, path)
+    return path
+
+
+def read(root='dmps_parquet', year=None, month=None, columns=None):
+    """ reads the daily tables back as one DataFrame, only opening the
+    partitions (year/month) and columns that are asked for. The days can have
+    different columns (e.g. a day without answers), they are read with the
+    columns of all days together.
+    """
+    require_pyarrow()
+    dataset = ds.dataset(root, format='parquet', partitioning='hive')
+    condition = None
+    if year is not None:
+        condition = ds.field('year') == int(year)
+    if month is not None:
+        month_condition = ds.field('month') == int(month)
+        condition = month_condition if condition is None else condition & month_condition
+    # the dataset takes its schema from the first file, use the columns of all files instead
+    partition_fields = [dataset.schema.field(name) for name in ('year', 'month') if name in dataset.schema.names]
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments(filter=condition)]
+    schema = pa.unify_schemas(schemas + [pa.schema(partition_fields)], promote_options='permissive')
+    dataset = ds.dataset(root, schema=schema, format='parquet', partitioning='hive')
+    if columns is None:
+        return dataset.to_table(filter=condition).to_pandas()
+    # by field, a name like answer.text is not a nested field; days without a column give NaN
+    selected = {name: ds.field(name) for name in columns if name in schema.names}
+    return dataset.to_table(columns=selected, filter=condition).to_pandas().reindex(columns=columns)
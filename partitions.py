@@ -0,0 +1,213 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+
+import archive
+import file_scan
+import json_codec
+
+# the daily files are kept in root/year=yyyy/month=mm/ (like the parquet output), each
+# partition has a manifest with the files in it, so readers only open the months they need
+MANIFEST_FILE = 'manifest.json'
+DAILY_FILE = re.compile(r'(\d{4}-\d{2}-\d{2})\.json(\.zst|\.gz)?$')
+_YEAR = re.compile(r'year=(\d{4})$')
+_MONTH = re.compile(r'month=(\d{2})$')
+
+# day_job backfills can write several days of one partition at the same time
+_manifest_lock = threading.Lock()
+
+
+def partition_folder(root, day):
+    """ :param day: date as yyyy-mm-dd
+    """
+    return os.path.join(root, f'year={day[0:4]}', f'month={day[5:7]}')
+
+
+def load_manifest(folder):
+    """ the manifest of a partition:
+    {'files': {file name: {'day', 'pages', 'rows', 'first_updated', 'last_updated', 'size', 'sha256'}},
+     'rows': ..., 'first_day': ..., 'last_day': ...}
+    """
+    path = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'files': {}}
+    return json_codec.load_file(path)
+
+
+def save_manifest(folder, manifest):
+    days = [entry['day'] for entry in manifest['files'].values()]
+    manifest['rows'] = sum(entry['rows'] for entry in manifest['files'].values())
+    manifest['first_day'] = min(days, default=None)
+    manifest['last_day'] = max(days, default=None)
+    json_codec.dump_file(manifest, os.path.join(folder, MANIFEST_FILE), indent=2)
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(archive.READ_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def counted(pages, stats):
+    """ passes the pages on and counts them, their plans and the range of last_updated in stats
+    """
+    stats.update({'pages': 0, 'rows': 0, 'first_updated': None, 'last_updated': None})
+    for page in pages:
+        stats['pages'] += 1
+        for plan in page or []:
+            stats['rows'] += 1
+            updated = plan['last_updated']
+            if stats['first_updated'] is None or updated < stats['first_updated']:
+                stats['first_updated'] = updated
+            if stats['last_updated'] is None or updated > stats['last_updated']:
+                stats['last_updated'] = updated
+        yield page
+
+
+def record(folder, path, day, stats):
+    """ adds (or replaces) the entry of a daily file in the manifest of its partition
+    """
+    entry = dict(stats, day=day, size=os.path.getsize(path), sha256=sha256(path))
+    with _manifest_lock:
+        manifest = load_manifest(folder)
+        for name in archive.variants(os.path.basename(path)):
+            manifest['files'].pop(name, None)
+        manifest['files'][os.path.basename(path)] = entry
+        save_manifest(folder, manifest)
+
+
+def write_day(root, day, pages):
+    """ writes the pages downloaded for day to its partition and records the file in the manifest
+    :returns path of the written file
+    """
+    folder = partition_folder(root, day)
+    os.makedirs(folder, exist_ok=True)
+    stats = {}
+    archive.write_pages(os.path.join(folder, f'{day}.json'), counted(pages, stats))
+    path = archive.find(os.path.join(folder, f'{day}.json'))
+    record(folder, path, day, stats)
+    return path
+
+
+def valid_day(root, day):
+    """ whether the daily file of day is complete: in the manifest of its partition with
+    the size and checksum recorded there, or (from before the partitions) a file in root
+    that can be read to the end
+    """
+    folder = partition_folder(root, day)
+    for name, entry in load_manifest(folder)['files'].items():
+        if entry['day'] == day:
+            path = os.path.join(folder, name)
+            return os.path.exists(path) and os.path.getsize(path) == entry['size'] and sha256(path) == entry['sha256']
+    path = archive.find(os.path.join(root, f'{day}.json'))
+    if path is None:
+        return False
+    try:
+        for _ in archive.iter_pages(path):
+            pass
+    except Exception:  # truncated, not json or not decompressable
+        return False
+    return True
+
+
+def day_range(start=None, end=None):
+    """ first and last day (yyyy-mm-dd) of a period given as days or years, None for no limit
+    """
+    first = '0000-01-01' if start is None else str(start)
+    last = '9999-12-31' if end is None else str(end)
+    if len(first) == 4:
+        first = f'{first}-01-01'
+    if len(last) == 4:
+        last = f'{last}-12-31'
+    return first, last
+
+
+def folders(root, start=None, end=None):
+    """ the partition folders of root (oldest first) with months between start and end
+    :param start: first day (yyyy-mm-dd or date) or year (yyyy), None for no limit
+    :param end: last day or year, None for no limit
+    """
+    first, last = (day[0:7] for day in day_range(start, end))
+    found = []
+    if not os.path.isdir(root):
+        return found
+    with os.scandir(root) as years:
+        for year in years:
+            year_match = _YEAR.match(year.name)
+            if not year.is_dir() or not year_match or not first[0:4] <= year_match.group(1) <= last[0:4]:
+                continue
+            with os.scandir(year.path) as months:
+                for month in months:
+                    month_match = _MONTH.match(month.name)
+                    period = f'{year_match.group(1)}-{month_match.group(1)}' if month_match else None
+                    if month.is_dir() and period and first <= period <= last:
+                        found.append((period, month.path))
+    return [path for _, path in sorted(found)]
+
+
+def daily_files(root, start=None, end=None):
+    """ the daily json files between start and end (see folders), from the manifests of
+    the partitions and the files still in root itself (from before the partitions)
+    :returns list of (day, path), oldest first
+    """
+    first, last = day_range(start, end)
+    files = []
+    if os.path.isdir(root):
+        files.extend((DAILY_FILE.match(file.name).group(1), file.path)
+                     for file in file_scan.scan(root, pattern=DAILY_FILE))
+    for folder in folders(root, start, end):
+        for name, entry in load_manifest(folder)['files'].items():
+            files.append((entry['day'], os.path.join(folder, name)))
+    return sorted(file for file in files if first <= file[0] <= last)
+
+
+def migrate(root):
+    """ moves the daily files (and their csv files) from root into the partitions
+    :returns number of files moved
+    """
+    count = 0
+    for file in file_scan.scan(root, pattern=DAILY_FILE):
+        day, path = DAILY_FILE.match(file.name).group(1), file.path
+        written = write_day(root, day, archive.iter_pages(path))
+        os.remove(path)
+        csv = os.path.join(root, f'{day}.csv')
+        if os.path.exists(csv):
+            os.replace(csv, os.path.join(os.path.dirname(written), f'{day}.csv'))
+        print(f'{os.path.basename(path)} -> {written}')
+        count += 1
+    return count
+
+
+def verify(root):
+    """ checks the size and checksum of every file in the manifests and that every daily file is in one
+    :returns list of problems (empty if all is well)
+    """
+    problems = []
+    for folder in folders(root):
+        files = load_manifest(folder)['files']
+        for name, entry in files.items():
+            path = os.path.join(folder, name)
+            if not os.path.exists(path):
+                problems.append(f'{path}: missing')
+            elif os.path.getsize(path) != entry['size'] or sha256(path) != entry['sha256']:
+                problems.append(f'{path}: changed since it was written')
+        with os.scandir(folder) as entries:
+            problems.extend(f'{entry.path}: not in the manifest' for entry in entries
+                            if DAILY_FILE.match(entry.name) and entry.name not in files)
+    return problems
+
+
+if __name__ == "__main__":
+    # python partitions.py migrate dmps: move the daily files into year=/month= partitions
+    # python partitions.py verify dmps: check the files against the manifests
+    if len(sys.argv) == 3 and sys.argv[1] == 'migrate':
+        print(f'{migrate(sys.argv[2])} daily files moved into partitions')
+    elif len(sys.argv) == 3 and sys.argv[1] == 'verify':
+        problems = verify(sys.argv[2])
+        print('\n'.join(problems) if problems else 'all files match the manifests')
+    else:
+        print('usage: python partitions.py migrate|verify <folder with daily json files>')
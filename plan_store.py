@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+import archive
+import config
+import dmp_catalog
+import json_codec
+import partitions
+
+# the store sits next to the daily json files (see store_path), can be overridden in config.py
+STORE_NAME = 'plans.sqlite'
+STORE_FILE = getattr(config, 'PLAN_STORE', None)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER NOT NULL,
+    last_updated TEXT NOT NULL,
+    creation_date TEXT,
+    title TEXT,
+    template TEXT,
+    funder TEXT,
+    file_date TEXT NOT NULL,  -- date of the daily download the version is in
+    plan TEXT NOT NULL,  -- full plan json
+    PRIMARY KEY (id, last_updated, file_date)  -- a row per daily file, like the catalog
+);
+CREATE INDEX IF NOT EXISTS plans_template ON plans (template, file_date);
+CREATE INDEX IF NOT EXISTS plans_file_date ON plans (file_date);
+-- the daily downloads whose plans were added, the other days are read from the daily files
+CREATE TABLE IF NOT EXISTS days (
+    file_date TEXT PRIMARY KEY
+);
+'''
+
+HEADER_COLUMNS = ['id', 'title', 'template', 'funder', 'last_updated', 'creation_date', 'file_name']
+
+
+def store_path(root='dmps'):
+    """ the store of the daily files in root: PLAN_STORE from config.py or root/plans.sqlite
+    """
+    return STORE_FILE or os.path.join(root, STORE_NAME)
+
+
+def connect(path=None):
+    con = sqlite3.connect(path or store_path())
+    con.executescript(SCHEMA)
+    return con
+
+
+def add_pages(pages, file_date, path=None, complete=True):
+    """ stores the plans of one daily download (or of a page of it)
+    :param file_date: date of the download (yyyy-mm-dd)
+    :param complete: the last pages of the day, the day is recorded
+    :returns number of new plan versions
+    """
+    rows = [(plan['id'], plan['last_updated'], plan.get('creation_date'), plan.get('title'),
+             (plan.get('template') or {}).get('title'), (plan.get('funder') or {}).get('name'),
+             file_date, json_codec.dumps(plan))
+            for page in pages if page for plan in page]
+    con = connect(path)
+    try:
+        with con:
+            before = con.total_changes
+            con.executemany('INSERT OR IGNORE INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            added = con.total_changes - before
+            if complete:
+                con.execute('INSERT OR IGNORE INTO days VALUES (?)', (file_date,))
+            return added
+    finally:
+        con.close()
+
+
+def import_files(folder, path=None):
+    """ loads the existing daily json files (plain or compressed, in the partitions of folder) into the store
+    """
+    path = path or store_path(folder)
+    total = 0
+    for day, file in partitions.daily_files(folder):
+        added = add_pages(archive.iter_pages(file), day, path)
+        print(f'{os.path.basename(file)}: {added} new plan versions')
+        total += added
+    return total
+
+
+def headers(year=None, templates=None, path=None):
+    """ id, title, template, funder, last_updated, creation_date and file_name of
+    every stored plan version, like Step 2 of the stats scripts reads them from
+    the daily files (id as text, a row per daily file a version is in)
+    :param year: only versions downloaded in that year
+    :param templates: only versions with one of these template titles
+    :returns DataFrame with HEADER_COLUMNS, ordered by download date
+    """
+    sql = ("SELECT CAST(id AS TEXT) AS id, title, template, funder, last_updated, creation_date, "
+           "file_date || '.json' AS file_name FROM plans WHERE 1=1")
+    params = []
+    if year is not None:
+        sql += ' AND file_date >= ? AND file_date < ?'
+        params += [f'{year}-01-01', f'{int(year) + 1}-01-01']
+    if templates:
+        sql += f' AND template IN ({", ".join("?" * len(templates))})'
+        params += list(templates)
+    sql += ' ORDER BY file_date, rowid'
+    con = connect(path)
+    try:
+        return pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+
+
+def days(path=None):
+    """ the days (yyyy-mm-dd) whose downloads are in the store, none if there is no store
+    """
+    path = path or store_path()
+    if not os.path.exists(path):
+        return set()
+    con = connect(path)
+    try:
+        return {day for (day,) in con.execute('SELECT file_date FROM days')}
+    finally:
+        con.close()
+
+
+def all_headers(root='dmps', year=None, path=None):
+    """ headers of the plans of every daily download, from the store for the days it has
+    recorded and from the daily files (dmp_catalog) for the others
+    :returns DataFrame with HEADER_COLUMNS, ordered by download date
+    """
+    path = path or store_path(root)
+    stored = days(path)
+    parts = [dmp_catalog.headers(root, year=year, skip_days=stored)]
+    if stored:
+        parts.append(headers(year=year, path=path))
+    data = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    return data.sort_values('file_name', kind='stable', ignore_index=True)
+
+
+
+
+if __name__ == "__main__":
+    # python plan_store.py import dmps: load the existing daily files into the store
+    if len(sys.argv) == 3 and sys.argv[1] == 'import':
+        print(f'{import_files(sys.argv[2])} plan versions added to {store_path(sys.argv[2])}')
+    else:
+        print('usage: python plan_store.py import <folder with daily json files>')
@@ -0,0 +1,23 @@
+# a sweep costs one request per page of the full plan list, downloading plans one by one
+# costs (at least) two requests per plan, so above this many plans a sweep is cheaper
+SWEEP_THRESHOLD = 150
+
+
+def sweep(pages, wanted, templates):
+    """ goes through the pages of the full plan list once and picks out the wanted plans
+    :param pages: page generator, e.g. api_v0.retrieve_plans() without identifier
+    :param wanted: plan ids to keep (as str or int)
+    :param templates: template titles to keep
+    :returns generator of the plans (dicts) that have a wanted id and template
+    """
+    wanted = {str(id) for id in wanted}
+    found = set()
+    for page in pages:
+        for plan in page:
+            id = str(plan['id'])
+            if id in wanted and plan['template']['title'] in templates:
+                found.add(id)
+                yield plan
+    missing = wanted - found
+    if missing:
+        print(f'{len(missing)} plans not found in the plan list: {sorted(missing)}')
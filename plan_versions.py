@@ -0,0 +1,302 @@
+import copy
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+import archive
+import config
+import dmp_catalog
+import json_codec
+import partitions
+
+# the version store sits next to the daily json files, can be overridden in config.py
+VERSION_NAME = 'versions.sqlite'
+VERSION_FILE = getattr(config, 'VERSION_STORE', None)
+# every KEYFRAME_INTERVAL-th version of a plan is stored in full, the others as changes
+KEYFRAME_INTERVAL = 10
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER NOT NULL,
+    version INTEGER NOT NULL,  -- 0 for the first version of a plan, then 1, 2, ...
+    last_updated TEXT NOT NULL,
+    creation_date TEXT,
+    file_date TEXT NOT NULL,  -- date of the daily download the version first appeared in
+    snapshot INTEGER NOT NULL,  -- 1: data is the full plan, 0: data is a delta
+    changed INTEGER NOT NULL,  -- number of changed values (0 for the first version)
+    data TEXT NOT NULL,
+    PRIMARY KEY (id, version)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS versions_last_updated ON versions (id, last_updated);
+-- the daily downloads whose plans were added, the other days are read from the daily files
+CREATE TABLE IF NOT EXISTS days (
+    file_date TEXT PRIMARY KEY
+);
+'''
+
+VERSION_COLUMNS = ['id', 'version', 'last_updated', 'creation_date', 'file_date', 'changed']
+HEADER_COLUMNS = ['id', 'last_updated', 'creation_date']
+CHANGE_COLUMNS = ['id', 'version', 'last_updated', 'path', 'value']
+
+
+def store_path(root='dmps'):
+    """ the version store of the daily files in root: VERSION_STORE from config.py or root/versions.sqlite
+    """
+    return VERSION_FILE or os.path.join(root, VERSION_NAME)
+
+
+def connect(path=None):
+    con = sqlite3.connect(path or store_path())
+    con.executescript(SCHEMA)
+    return con
+
+
+def diff(old, new, path=()):
+    """ the changes from old to new, dicts key by key and lists of the same length item by item
+    :returns list of changes: [path, value] sets a value, [path] removes a key
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key, value in new.items():
+            if key in old:
+                changes.extend(diff(old[key], value, path + (key,)))
+            else:
+                changes.append([list(path) + [key], value])
+        changes.extend([list(path) + [key]] for key in old if key not in new)
+        return changes
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changes = []
+        for index, (old_value, new_value) in enumerate(zip(old, new)):
+            changes.extend(diff(old_value, new_value, path + (index,)))
+        return changes
+    if type(old) is type(new) and old == new:
+        return []
+    return [[list(path), new]]
+
+
+def patch(plan, changes):
+    """ applies the changes made by diff to a copy of plan
+    """
+    plan = copy.deepcopy(plan)
+    for change in changes:
+        path = change[0]
+        if not path:
+            plan = change[1]
+            continue
+        parent = plan
+        for key in path[:-1]:
+            parent = parent[key]
+        if len(change) == 2:
+            parent[path[-1]] = change[1]
+        else:
+            del parent[path[-1]]
+    return plan
+
+
+def rebuild(con, id, version):
+    """ a stored version of a plan, from the keyframe before it
+    """
+    rows = con.execute('SELECT snapshot, data FROM versions WHERE id = ? AND version <= ? AND version >= '
+                       '(SELECT MAX(version) FROM versions WHERE id = ? AND version <= ? AND snapshot = 1) '
+                       'ORDER BY version', (id, version, id, version)).fetchall()
+    if not rows:
+        return None
+    plan = json_codec.loads(rows[0][1])
+    for _, data in rows[1:]:
+        plan = patch(plan, json_codec.loads(data))
+    return plan
+
+
+def insert_version(con, id, version, plan, previous, file_date):
+    """ writes plan as version of id, in full or as the changes to previous
+    """
+    if version % KEYFRAME_INTERVAL == 0:
+        snapshot, changed, data = 1, 0, plan
+        if previous is not None:
+            changed = len(diff(previous, plan))
+    else:
+        data = diff(previous, plan)
+        snapshot, changed = 0, len(data)
+    con.execute('INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (id, version, plan['last_updated'], plan.get('creation_date'), file_date,
+                 snapshot, changed, json_codec.dumps(data)))
+
+
+def add_plan(con, plan, file_date, latest):
+    """ stores plan as a version of its id in the order of last_updated, an older version
+    is put in between and the versions after it are stored again
+    :param latest: {id: (version, plan)} of the plans added before, saves rebuilding them
+    :returns 1 if a version was added, else 0
+    """
+    id = plan['id']
+    if id in latest:
+        version, previous = latest[id]
+    else:
+        row = con.execute('SELECT MAX(version) FROM versions WHERE id = ?', (id,)).fetchone()
+        version = row[0]
+        previous = None if version is None else rebuild(con, id, version)
+    if previous is None or plan['last_updated'] > previous['last_updated']:
+        version = 0 if previous is None else version + 1
+        insert_version(con, id, version, plan, previous, file_date)
+        latest[id] = (version, plan)
+        return 1
+    if con.execute('SELECT 1 FROM versions WHERE id = ? AND last_updated = ?',
+                   (id, plan['last_updated'])).fetchone():
+        return 0
+    rows = con.execute('SELECT version, file_date, snapshot, data FROM versions WHERE id = ? AND last_updated > ? '
+                       'ORDER BY version', (id, plan['last_updated'])).fetchall()
+    start = rows[0][0]
+    later = []
+    for _, day, snapshot, data in rows:
+        if not later:
+            current = rebuild(con, id, start)
+        else:
+            current = json_codec.loads(data) if snapshot else patch(later[-1][0], json_codec.loads(data))
+        later.append((current, day))
+    previous = rebuild(con, id, start - 1) if start else None
+    con.execute('DELETE FROM versions WHERE id = ? AND version >= ?', (id, start))
+    for version, (current, day) in enumerate([(plan, file_date)] + later, start):
+        insert_version(con, id, version, current, previous, day)
+        previous = current
+    latest[id] = (version, previous)
+    return 1
+
+
+def add_pages(pages, file_date, path=None, complete=True):
+    """ adds the plan versions of one daily download (or of a page of it)
+    :param file_date: date of the download (yyyy-mm-dd)
+    :param complete: the last pages of the day, the day is recorded
+    :returns number of new plan versions
+    """
+    con = connect(path)
+    try:
+        with con:
+            latest = {}
+            added = sum(add_plan(con, plan, file_date, latest)
+                        for page in pages if page for plan in page)
+            if complete:
+                con.execute('INSERT OR IGNORE INTO days VALUES (?)', (file_date,))
+            return added
+    finally:
+        con.close()
+
+
+def import_files(folder, path=None):
+    """ adds the daily json files in the partitions of folder to the store
+    """
+    path = path or store_path(folder)
+    total = 0
+    for day, file in partitions.daily_files(folder):
+        added = add_pages(archive.iter_pages(file), day, path)
+        print(f'{os.path.basename(file)}: {added} new plan versions')
+        total += added
+    return total
+
+
+def plan_version(id, last_updated=None, path=None):
+    """ a version of a plan as it was downloaded
+    :param last_updated: the last_updated of the version, None for the latest version
+    :returns plan dict, None if the store doesn't have it
+    """
+    con = connect(path)
+    try:
+        if last_updated is None:
+            row = con.execute('SELECT MAX(version) FROM versions WHERE id = ?', (int(id),)).fetchone()
+        else:
+            row = con.execute('SELECT version FROM versions WHERE id = ? AND last_updated = ?',
+                              (int(id), last_updated)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return rebuild(con, int(id), row[0])
+    finally:
+        con.close()
+
+
+def history(id, path=None):
+    """ all versions of a plan, oldest first, each built from the one before it
+    :returns generator of plan dicts
+    """
+    con = connect(path)
+    try:
+        plan = None
+        for snapshot, data in con.execute('SELECT snapshot, data FROM versions WHERE id = ? ORDER BY version',
+                                          (int(id),)):
+            plan = json_codec.loads(data) if snapshot else patch(plan, json_codec.loads(data))
+            yield plan
+    finally:
+        con.close()
+
+
+def versions(path=None):
+    """ one row for every stored version of every plan (id as text)
+    :returns DataFrame with VERSION_COLUMNS, ordered by id and version
+    """
+    con = connect(path)
+    try:
+        return pd.read_sql_query('SELECT CAST(id AS TEXT) AS id, version, last_updated, creation_date, '
+                                 'file_date, changed FROM versions ORDER BY id, version', con)
+    finally:
+        con.close()
+
+
+def days(path=None):
+    """ the days (yyyy-mm-dd) whose downloads are in the store, none if there is no store
+    """
+    path = path or store_path()
+    if not os.path.exists(path):
+        return set()
+    con = connect(path)
+    try:
+        return {day for (day,) in con.execute('SELECT file_date FROM days')}
+    finally:
+        con.close()
+
+
+def headers(root='dmps', path=None):
+    """ id, last_updated and creation_date of every plan version, from the store for the
+    days it has recorded and from the daily files (dmp_catalog) for the others
+    :returns DataFrame with HEADER_COLUMNS (id as text)
+    """
+    path = path or store_path(root)
+    stored = days(path)
+    data = dmp_catalog.headers(root, skip_days=stored)[HEADER_COLUMNS]
+    if stored:
+        data = pd.concat([versions(path)[HEADER_COLUMNS], data], ignore_index=True)
+    return data.drop_duplicates(ignore_index=True)
+
+
+def changes(prefix=('plan_content',), path=None):
+    """ the changed values of every version after the first, e.g. edited answers
+    :param prefix: only changes below this path, None for all
+    :returns DataFrame with CHANGE_COLUMNS
+    """
+    prefix = list(prefix or [])
+    rows = []
+    con = connect(path)
+    try:
+        previous = {}
+        for id, version, last_updated, snapshot, data in con.execute(
+                'SELECT id, version, last_updated, snapshot, data FROM versions ORDER BY id, version'):
+            data = json_codec.loads(data)
+            if snapshot:
+                plan, delta = data, (diff(previous[id], data) if id in previous else [])
+            else:
+                plan, delta = patch(previous[id], data), data
+            previous = {id: plan}
+            for change in delta:
+                if change[0][:len(prefix)] == prefix:
+                    value = json_codec.dumps(change[1]) if len(change) == 2 else None
+                    rows.append([str(id), version, last_updated, '/'.join(str(key) for key in change[0]), value])
+    finally:
+        con.close()
+    return pd.DataFrame(rows, columns=CHANGE_COLUMNS)
+
+
+if __name__ == "__main__":
+    # python plan_versions.py import dmps: build the version history from the daily files
+    if len(sys.argv) == 3 and sys.argv[1] == 'import':
+        print(f'{import_files(sys.argv[2])} plan versions added to {store_path(sys.argv[2])}')
+    else:
+        print('usage: python plan_versions.py import <folder with daily json files>')
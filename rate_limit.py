@@ -0,0 +1,93 @@
+import threading
+import time
+
+import config
+
+# can be overridden in config.py, RATE = None switches the limiter off
+RATE = getattr(config, 'RATE', 5.0)  # requests per second
+BURST = getattr(config, 'BURST', 10)  # requests that may be sent at once after a quiet period
+SLOWDOWN = 0.5  # rate is multiplied by this after a 429
+RECOVERY = 60  # seconds after a 429 before the full rate is used again
+
+
+class TokenBucket:
+    """ token bucket shared by all threads in the process
+    every request takes a token, tokens come back at `rate` per second up to `burst`.
+    After a 429 (too many requests) the rate is lowered for a while and, if the
+    server sent Retry-After, nobody sends anything until that time has passed.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.slow_until = 0
+        self.lock = threading.Lock()
+        self.waited = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+    def current_rate(self, now):
+        return self.rate * SLOWDOWN if now < self.slow_until else self.rate
+
+    def acquire(self):
+        """ blocks until a request may be sent
+        :returns seconds waited
+        """
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.current_rate(now))
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    waited = now - start
+                    self.waited += waited
+                    self.requests += 1
+                    return waited
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.current_rate(now))
+            time.sleep(delay)
+
+    def throttle(self, retry_after=None):
+        """ the server answered 429, slow down
+        :param retry_after: seconds the server asked to wait (Retry-After header)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self.tokens = 0
+            self.slow_until = now + RECOVERY
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def stats(self):
+        return {'requests': self.requests, 'waited': round(self.waited, 2),
+                'throttled': self.throttled}
+
+
+limiter = TokenBucket(RATE, BURST) if RATE else None
+
+
+def configure(rate, burst=None):
+    """ change the request rate (None switches the limiter off)
+    """
+    global limiter
+    limiter = TokenBucket(rate, burst or BURST) if rate else None
+
+
+def acquire():
+    return limiter.acquire() if limiter else 0.0
+
+
+def throttle(retry_after=None):
+    if limiter:
+        limiter.throttle(retry_after)
+
+
+def stats():
+    """ number of requests sent, total seconds callers waited and number of 429s
+    """
+    return limiter.stats() if limiter else {'requests': 0, 'waited': 0.0, 'throttled': 0}
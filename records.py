@@ -0,0 +1,49 @@
+import pandas as pd
+
+
+class RecordBuilder:
+    """ collects the rows of a table column by column and makes the DataFrame once at the end.
+    Adding the rows of every file with pd.concat copies everything collected so far each
+    time (quadratic in the number of files), extending the column lists does not.
+    """
+
+    def __init__(self, columns=None):
+        """ :param columns: names of the columns in their order, None to take them from the first add
+        """
+        self.columns = None if columns is None else list(columns)
+        self.buffers = None if columns is None else {column: [] for column in self.columns}
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    def add(self, values):
+        """ adds the rows of one file
+        :param values: {column: list of values}, the lists all of the same length, or a single
+        value (e.g. '') for a column that has that value in every row
+        :returns number of rows added
+        """
+        if self.columns is None:
+            self.columns = list(values)
+            self.buffers = {column: [] for column in self.columns}
+        if values.keys() != self.buffers.keys():
+            raise ValueError(f'columns {list(values)} differ from {self.columns}')
+        lengths = {len(value) for value in values.values() if isinstance(value, (list, tuple))}
+        if len(lengths) > 1:
+            raise ValueError(f'columns of different lengths: {sorted(lengths)}')
+        count = lengths.pop() if lengths else 1
+        for column, value in values.items():
+            if isinstance(value, (list, tuple)):
+                self.buffers[column].extend(value)
+            else:
+                self.buffers[column].extend([value] * count)
+        self.rows += count
+        return count
+
+    def build(self):
+        """ :returns DataFrame with the rows in the order they were added (index 0, 1, ...),
+        an empty DataFrame with the columns if no rows were added
+        """
+        if not self.rows:
+            return pd.DataFrame(columns=self.columns)  # object columns, so .str works on them
+        return pd.DataFrame(self.buffers, columns=self.columns)
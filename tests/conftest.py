@@ -0,0 +1,13 @@
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# the modules read their settings from config.py, which is not in the repository:
+# without one the tests use the template (no secret, the defaults for the rest)
+try:
+    import config  # noqa: F401
+except ImportError:
+    sys.modules['config'] = importlib.import_module('configTEMPLATE')
@@ -0,0 +1,65 @@
+import requests
+
+import batching
+
+
+def _fetch(bad=(), calls=None):
+    def fetch(ids):
+        if calls is not None:
+            calls.append(list(ids))
+        for id in ids:
+            yield None if id in bad else {'id': id}
+    return fetch
+
+
+def _fetched(chunks):
+    return [id for ids, _ in chunks for id in ids]
+
+
+def test_bad_id_is_left_out_without_waiting(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(batching.time, 'sleep', sleeps.append)
+    calls = []
+    ids = [999] + list(range(1, 41))
+    chunks = list(batching.fetch_in_chunks(_fetch({999}, calls), ids, chunk_size=10))
+    assert sorted(_fetched(chunks)) == list(range(1, 41))
+    assert sleeps == []
+    # the bad id is tried once more on its own, no other id twice
+    assert sum(call.count(999) for call in calls) == 2
+    assert sum(len(call) for call in calls) == len(ids) + 1
+
+
+def test_outage_waits_and_keeps_the_other_chunks(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(batching.time, 'sleep', sleeps.append)
+    down = {'calls': 2}
+
+    def fetch(ids):
+        if down['calls']:
+            down['calls'] -= 1
+            return [None] * len(ids)
+        return [{'id': id} for id in ids]
+
+    chunks = list(batching.fetch_in_chunks(fetch, range(25), chunk_size=10))
+    assert sorted(_fetched(chunks)) == list(range(25))
+    assert sleeps == [batching.OUTAGE_BACKOFF, batching.OUTAGE_BACKOFF * 2]
+
+
+def test_chunk_that_never_comes_back_is_left_out_alone(monkeypatch):
+    monkeypatch.setattr(batching.time, 'sleep', lambda delay: None)
+    chunks = list(batching.fetch_in_chunks(_fetch(set(range(10))), range(25), chunk_size=10))
+    assert sorted(_fetched(chunks)) == list(range(10, 25))
+
+
+def test_results_before_a_timeout_are_kept():
+    def fetch(ids):
+        for id in ids:
+            if id == 5 and not fetch.failed:
+                fetch.failed = True
+                raise requests.Timeout()
+            yield {'id': id}
+    fetch.failed = False
+
+    chunks = list(batching.fetch_in_chunks(fetch, range(10), chunk_size=10))
+    assert chunks[0][0] == [0, 1, 2, 3, 4]
+    assert sorted(_fetched(chunks)) == list(range(10))
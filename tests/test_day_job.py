@@ -0,0 +1,78 @@
+import os
+import random
+
+import pytest
+
+import day_job
+import mock_server
+import plan_store
+import plan_versions
+
+
+def _plan(id, last_updated, answer):
+    plan = mock_server.synthetic_plan(id, random.Random(id))
+    plan['last_updated'] = last_updated
+    plan['plan_content'][0]['sections'][0]['questions'][0]['answer'] = {'text': f'<p>{answer}</p>'}
+    return plan
+
+
+# the plans changed on each day: plan 1 on both days, plan 2 only on the later one
+DAYS = {
+    '2024-01-03': [[_plan(1, '2024-01-03T12:00:00Z', 'first'), _plan(3, '2024-01-03T13:00:00Z', 'other')]],
+    '2024-01-05': [[_plan(1, '2024-01-05T12:00:00Z', 'second')], [_plan(2, '2024-01-05T13:00:00Z', 'new')]],
+}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    def retrieve_plans(day, prefetch=1):
+        yield from DAYS[day]
+    monkeypatch.setattr(day_job.api, 'retrieve_plans', retrieve_plans)
+    monkeypatch.setattr(day_job, 'OUTPUT_FORMATS', ['csv'])
+
+
+@pytest.mark.parametrize('streaming', [True, False])
+@pytest.mark.parametrize('transform_workers', [1, 2])
+def test_backfill_older_day(tmp_path, api, monkeypatch, streaming, transform_workers):
+    monkeypatch.setattr(day_job, 'STREAMING', streaming)
+    root = str(tmp_path)
+    assert day_job.backfill('2024-01-05', '2024-01-05', root, transform_workers=transform_workers)['done']
+    # a day older than the one stored, as when missed days are caught up after later runs
+    result = day_job.backfill('2024-01-03', '2024-01-05', root, transform_workers=transform_workers)
+    assert result['done'].keys() == {'2024-01-03'}
+
+    path = plan_versions.store_path(root)
+    assert plan_versions.days(path) == {'2024-01-03', '2024-01-05'}
+    history = list(plan_versions.history(1, path))
+    assert [plan['last_updated'] for plan in history] == ['2024-01-03T12:00:00Z', '2024-01-05T12:00:00Z']
+    assert history[0] == DAYS['2024-01-03'][0][0]
+    assert history[1] == DAYS['2024-01-05'][0][0]
+    assert plan_versions.plan_version(3, path=path) == DAYS['2024-01-03'][0][1]
+    assert sorted(plan_versions.versions(path)['id']) == ['1', '1', '2', '3']
+
+    for day, pages in DAYS.items():
+        csv = os.path.join(root, 'year=2024', 'month=01', f'{day}.csv')
+        assert sum(1 for _ in open(csv, encoding='utf-8')) > 1
+
+
+def test_parquet_next_to_root(tmp_path, api, monkeypatch):
+    pytest.importorskip('pyarrow')
+    monkeypatch.setattr(day_job, 'OUTPUT_FORMATS', ['parquet'])
+    root = str(tmp_path / 'dmps')
+    day_job.backfill('2024-01-05', '2024-01-05', root, transform_workers=1)
+    assert os.path.exists(tmp_path / 'dmps_parquet' / 'year=2024' / 'month=01' / '2024-01-05.parquet')
+    assert day_job.day_done('2024-01-05', root)
+
+
+def test_day_that_stops_halfway_is_not_recorded(tmp_path, monkeypatch):
+    def retrieve_plans(day, prefetch=1):
+        yield DAYS['2024-01-05'][0]
+        raise ConnectionError('connection lost')
+    monkeypatch.setattr(day_job.api, 'retrieve_plans', retrieve_plans)
+    monkeypatch.setattr(day_job, 'OUTPUT_FORMATS', ['csv'])
+    monkeypatch.setattr(day_job, 'STREAMING', True)
+    root = str(tmp_path)
+    result = day_job.backfill('2024-01-05', '2024-01-05', root, transform_workers=1)
+    assert result['failed'].keys() == {'2024-01-05'}
+    assert plan_store.days(plan_store.store_path(root)) == set()
+    assert plan_versions.days(plan_versions.store_path(root)) == set()
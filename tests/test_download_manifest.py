@@ -0,0 +1,26 @@
+import download_manifest
+
+
+def test_a_plan_in_two_files(tmp_path):
+    gdpr, cert = str(tmp_path / 'gdpr.json'), str(tmp_path / 'cert.json')
+    for file in (gdpr, cert):
+        open(file, 'w').write('[]')
+    manifest_file = str(tmp_path / 'manifest.json')
+    manifest = download_manifest.load_manifest(manifest_file)
+    download_manifest.record(manifest, 12, '2024-01-05', gdpr)
+    download_manifest.save_manifest(manifest, manifest_file)
+
+    manifest = download_manifest.load_manifest(manifest_file)
+    assert download_manifest.is_current(manifest, '12', '2024-01-05', gdpr)
+    assert not download_manifest.is_current(manifest, '12', '2024-01-05', cert)
+    assert not download_manifest.is_current(manifest, '12', '2024-01-06', gdpr)
+
+
+def test_remove(tmp_path):
+    file = str(tmp_path / '12.json')
+    open(file + '.gz', 'wb').write(b'')
+    manifest = {}
+    download_manifest.record(manifest, 12, '2024-01-05', file)
+    assert download_manifest.remove(manifest, file) == file + '.gz'
+    assert manifest == {}
+    assert download_manifest.remove(manifest, file) is None
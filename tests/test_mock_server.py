@@ -0,0 +1,39 @@
+import random
+import threading
+from functools import partial
+
+import pytest
+
+import api_v1
+import batching
+import mock_server
+
+
+@pytest.fixture
+def server(monkeypatch):
+    rnd = random.Random(1)
+    plans = {id: mock_server.synthetic_plan(id, rnd) for id in (7, 1234, 100001, 987654)}
+    server = mock_server.MockServer(('localhost', 0), plans)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(api_v1, 'DMP_ONLINE_URL', f'http://localhost:{server.server_port}/api/v1')
+    monkeypatch.setattr(api_v1, 'TOKEN_CACHE_FILE', None)
+    monkeypatch.setattr(api_v1, '_token', {'access_token': None, 'expires_at': 0})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_plan_ids_of_the_fetched_metadata(server):
+    # Step 8 and 9 of the stats scripts (Step 3 and 4 of DMPs_updates): the ids cut out of
+    # the metadata are the ones the rest of the script merges on
+    ids = sorted(server.plans)
+    fetched = [(id, item) for chunk_ids, items in batching.fetch_in_chunks(
+        partial(api_v1.retrieve_plans, workers=2), ids + [5], chunk_size=3)
+        for id, item in zip(chunk_ids, items)]
+    assert [id for id, _ in fetched] == ids
+    for id, page in fetched:
+        assert [api_v1.plan_id(item) for item in page] == [str(id)]
+
+
+def test_plan_id():
+    assert api_v1.plan_id({'dmp': {'dmp_id': {'identifier': 'https://dmponline.vu.nl/plans/42/'}}}) == '42'
@@ -0,0 +1,18 @@
+import records
+
+
+def test_build_without_rows_has_the_columns():
+    rows = records.RecordBuilder(['id', 'File_name', 'PersonalDataCheck'])
+    data = rows.build()
+    assert list(data.columns) == ['id', 'File_name', 'PersonalDataCheck']
+    # Step 5b of the stats scripts on an empty cert folder
+    assert len(data[data['PersonalDataCheck'].str.contains('Yes') == True]) == 0
+
+
+def test_build_keeps_the_order_of_the_rows():
+    rows = records.RecordBuilder(['id', 'File_name'])
+    rows.add({'id': ['1', '2'], 'File_name': 'a.json'})
+    rows.add({'id': ['3'], 'File_name': 'b.json'})
+    data = rows.build()
+    assert data['id'].tolist() == ['1', '2', '3']
+    assert data['File_name'].tolist() == ['a.json', 'a.json', 'b.json']